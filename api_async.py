@@ -0,0 +1,253 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from api_breaker import CircuitOpenError, is_backend_failure
+from api_client import (
+    create_mapping,
+    delete_mapping,
+    save_all_mappings,
+    update_mapping,
+)
+from api_transport import POOL_SIZE
+from iam_workflow import get_token
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+# Concurrency above the pool size would open throw-away connections.
+DEFAULT_CONCURRENCY = min(POOL_SIZE, int(os.getenv("KIM_API_BULK_CONCURRENCY", "8")))
+
+# Below this many creates/updates, concurrent single requests finish in
+# one or two round trips anyway; above it one batch PUT is cheaper.
+BATCH_MIN_OPS = int(os.getenv("KIM_API_BATCH_MIN_OPS", "16"))
+
+# Batch answers that mean "no such endpoint here": the items were not
+# applied and go out as individual requests instead
+BATCH_UNSUPPORTED_STATUSES = frozenset({404, 405, 501})
+
+# Answers that say the request was not processed (try again later)
+NOT_PROCESSED_STATUSES = frozenset({429, 503})
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+
+# -------------------------------------------------
+# Operations / results
+# -------------------------------------------------
+
+class MappingOp:
+    __slots__ = ("kind", "mapping_id", "payload", "ref")
+
+    def __init__(self, kind: str, mapping_id=None, payload: dict | None = None, ref=None):
+        if kind not in (CREATE, UPDATE, DELETE):
+            raise ValueError(f"Unknown mapping op: {kind!r}")
+        if kind != CREATE and not mapping_id:
+            raise ValueError(f"{kind} requires a mapping_id")
+
+        self.kind = kind
+        self.mapping_id = mapping_id
+        self.payload = payload
+        self.ref = ref  # caller-side handle (e.g. spreadsheet row)
+
+    def __repr__(self):
+        return f"MappingOp({self.kind!r}, {self.mapping_id!r})"
+
+
+class OpResult:
+    """
+    unknown: the op failed in a way that does not tell whether the backend
+    applied it (timeout, dropped connection, 5xx); re-sync before
+    re-sending anything that is not idempotent.
+    backend_failure: the failure was the backend being unavailable
+    (api_breaker.is_backend_failure), not a verdict on the op.
+    retry_after: seconds from the answer's Retry-After header, if any.
+    """
+
+    __slots__ = ("op", "ok", "status", "result", "error", "via_batch", "unknown", "backend_failure",
+                 "retry_after")
+
+    def __init__(self, op, ok, status=None, result=None, error=None, via_batch=False, unknown=False,
+                 backend_failure=False, retry_after=None):
+        self.op = op
+        self.ok = ok
+        self.status = status
+        self.result = result
+        self.error = error
+        self.via_batch = via_batch
+        self.unknown = unknown
+        self.backend_failure = backend_failure
+        self.retry_after = retry_after
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"error={self.error!r}"
+        return f"OpResult({self.op!r}, {state})"
+
+
+def _call(project, op: MappingOp, token):
+    if op.kind == CREATE:
+        return create_mapping(project, op.payload, token=token)
+    if op.kind == UPDATE:
+        return update_mapping(project, op.mapping_id, op.payload, token=token)
+    return delete_mapping(project, op.mapping_id, token=token)
+
+
+def _status(exc: Exception) -> int | None:
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code
+    return None
+
+
+def _retry_after(exc: Exception) -> float | None:
+    if not isinstance(exc, requests.HTTPError) or exc.response is None:
+        return None
+    try:
+        return max(0.0, float(exc.response.headers.get("Retry-After") or ""))
+    except ValueError:
+        return None  # absent, or an HTTP date
+
+
+def _not_sent(exc: Exception) -> bool:
+    """
+    The request never reached the backend (breaker open, connection
+    refused or not established in time).
+    """
+    if isinstance(exc, (CircuitOpenError, requests.ConnectTimeout)):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], "reason", None)
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+    return False
+
+
+def _maybe_applied(exc: Exception) -> bool:
+    if _not_sent(exc):
+        return False
+    status = _status(exc)
+    if status in NOT_PROCESSED_STATUSES:
+        return False
+    return status is None or status >= 500
+
+
+def _failure(op, exc: Exception, via_batch=False) -> OpResult:
+    return OpResult(
+        op, False, status=_status(exc), error=str(exc), via_batch=via_batch,
+        unknown=_maybe_applied(exc), backend_failure=is_backend_failure(exc),
+        retry_after=_retry_after(exc),
+    )
+
+
+def _batch_item(op: MappingOp) -> dict:
+    item = dict(op.payload or {})
+    if op.kind == UPDATE:
+        item["id"] = op.mapping_id
+    return item
+
+
+# -------------------------------------------------
+# Async client
+# -------------------------------------------------
+
+async def run_mapping_ops(
+    project: str,
+    ops: list[MappingOp],
+    token: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    use_batch: bool | None = None,
+) -> list[OpResult]:
+    """
+    Run mapping operations with bounded concurrency.
+
+    Results are returned in the order of `ops`, one per op; a failing op
+    never aborts the others.
+
+    use_batch:
+      None  -> send creates/updates through /mappings/batch when there are
+               at least BATCH_MIN_OPS of them
+      True  -> always batch creates/updates
+      False -> never batch
+    Deletes are always individual requests (the batch endpoint upserts).
+    If the batch call fails before reaching the backend, or the backend
+    has no batch endpoint (404/405/501), its items are sent individually
+    so every item reports its own outcome. Any other batch failure is
+    reported on every item (unknown if the backend may have applied it)
+    and nothing is re-sent: that could create mappings twice.
+    """
+    results: list[OpResult | None] = [None] * len(ops)
+    loop = asyncio.get_running_loop()
+    concurrency = max(1, concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kim-bulk") as pool:
+        upserts = [i for i, op in enumerate(ops) if op.kind != DELETE]
+        if use_batch is None:
+            use_batch = len(upserts) >= BATCH_MIN_OPS
+
+        pending = range(len(ops))
+
+        if use_batch and upserts:
+            items = [_batch_item(ops[i]) for i in upserts]
+            try:
+                body = await loop.run_in_executor(pool, save_all_mappings, project, items, token)
+            except Exception as e:
+                if not (_not_sent(e) or _status(e) in BATCH_UNSUPPORTED_STATUSES):
+                    for i in upserts:
+                        results[i] = _failure(ops[i], e, via_batch=True)
+                    pending = [i for i in pending if results[i] is None]
+            else:
+                per_item = body if isinstance(body, list) and len(body) == len(upserts) else None
+                for k, i in enumerate(upserts):
+                    results[i] = OpResult(
+                        ops[i], True,
+                        result=per_item[k] if per_item is not None else body,
+                        via_batch=True,
+                    )
+                pending = [i for i in pending if results[i] is None]
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(i):
+            op = ops[i]
+            async with sem:
+                try:
+                    res = await loop.run_in_executor(pool, _call, project, op, token)
+                except Exception as e:
+                    results[i] = _failure(op, e)
+                else:
+                    results[i] = OpResult(op, True, result=res)
+
+        await asyncio.gather(*(_one(i) for i in pending))
+
+    return results
+
+
+# -------------------------------------------------
+# Sync entry point (Streamlit pages)
+# -------------------------------------------------
+
+def bulk_apply(project: str, ops: list[MappingOp], concurrency: int = DEFAULT_CONCURRENCY, use_batch=None):
+    """
+    Blocking wrapper for a Streamlit script thread. Captures the session's
+    token here because worker threads cannot read session_state.
+    """
+    token = get_token()
+    if not token:
+        raise RuntimeError("Not authenticated (no access_token in session_state)")
+
+    return asyncio.run(run_mapping_ops(project, ops, token, concurrency, use_batch))
+
+
+def summarize(results: list[OpResult]) -> dict:
+    return {
+        "total": len(results),
+        "ok": sum(1 for r in results if r.ok),
+        "failed": sum(1 for r in results if not r.ok),
+        "unknown": sum(1 for r in results if r.unknown),
+        "batched": sum(1 for r in results if r.via_batch),
+    }
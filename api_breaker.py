@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+
+import requests
+
+
+# -------------------------------------------------
+# Config (env overridable)
+# -------------------------------------------------
+
+FAILURE_THRESHOLD = int(os.getenv("KIM_API_BREAKER_FAILURES", "5"))
+LATENCY_BUDGET = float(os.getenv("KIM_API_BREAKER_LATENCY_BUDGET", "20"))
+COOLDOWN = float(os.getenv("KIM_API_BREAKER_COOLDOWN", "15"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling the backend while the breaker is open.
+    """
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """
+    Errors that say "the backend is unhealthy" (as opposed to "this
+    request was wrong"): breaker open, connection errors, timeouts, 5xx.
+    """
+    if isinstance(exc, (CircuitOpenError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500
+    return False
+
+
+# -------------------------------------------------
+# Circuit breaker
+# -------------------------------------------------
+
+class CircuitBreaker:
+    """
+    closed     calls go through; FAILURE_THRESHOLD consecutive failures
+               (errors, 5xx, or calls slower than LATENCY_BUDGET) trip it
+    open       calls fail fast with CircuitOpenError; after COOLDOWN a
+               background health probe runs, and the next call becomes a
+               trial
+    half_open  one trial call (or probe) in flight; success closes the
+               breaker, failure re-opens it for another COOLDOWN
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, latency_budget=LATENCY_BUDGET, cooldown=COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._last_error = None
+        self._trips = 0
+        self._probe = None
+        self._probe_thread = None
+
+    # ---- call protocol ----
+
+    def before_call(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return
+
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    raise CircuitOpenError(self._open_message())
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._trial_in_flight:
+                raise CircuitOpenError("Backend recovering: trial request in flight")
+            self._trial_in_flight = True
+
+    def record_success(self, elapsed_s: float):
+        if elapsed_s > self.latency_budget:
+            self.record_failure(f"slow response ({elapsed_s:.1f}s > {self.latency_budget:.0f}s budget)")
+            return
+
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        The call ended without saying anything about backend health
+        (e.g. a local error before the request was sent).
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, reason: str):
+        with self._lock:
+            self._failures += 1
+            self._last_error = reason
+            self._trial_in_flight = False
+
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._trips += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                start_probe = self._probe is not None and not (
+                    self._probe_thread is not None and self._probe_thread.is_alive()
+                )
+            else:
+                start_probe = False
+
+        if start_probe:
+            self._probe_thread = threading.Thread(target=self._probe_loop, name="kim-health-probe", daemon=True)
+            self._probe_thread.start()
+
+    # ---- health probe ----
+
+    def set_probe(self, probe):
+        """
+        probe() -> bool; called from a background thread while open.
+        """
+        self._probe = probe
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.cooldown)
+
+            with self._lock:
+                if self._state == CLOSED:
+                    return
+                if self._trial_in_flight:
+                    continue
+                self._state = HALF_OPEN
+                self._trial_in_flight = True
+
+            start = time.monotonic()
+            try:
+                healthy = bool(self._probe())
+            except Exception as e:
+                healthy = False
+                reason = f"health probe: {type(e).__name__}"
+            else:
+                reason = "health probe failed"
+
+            if healthy:
+                self.record_success(time.monotonic() - start)
+                return
+            self.record_failure(reason)
+
+    # ---- state ----
+
+    def _open_message(self) -> str:
+        retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+        return f"Backend unavailable (circuit open, retry in {retry_in:.0f}s): {self._last_error}"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "last_error": self._last_error,
+                "retry_in_s": retry_in,
+            }
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+
+_breaker = CircuitBreaker()
+
+
+def get_breaker() -> CircuitBreaker:
+    return _breaker
+
+
+def breaker_state() -> dict:
+    return _breaker.snapshot()
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+MAX_BYTES = int(os.getenv("KIM_API_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+
+# -------------------------------------------------
+# Revalidating HTTP cache (ETag / Last-Modified)
+# -------------------------------------------------
+
+class _Entry:
+    __slots__ = ("etag", "last_modified", "content", "size")
+
+    def __init__(self, etag, last_modified, content: bytes):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content = content
+        self.size = len(content)
+
+
+class ConditionalCache:
+    """
+    Size-bounded LRU of raw response bodies plus their validators.
+
+    Entries are only ever served after the backend answered a conditional
+    request with 304 Not Modified, so the cache never returns data the
+    backend would not have returned itself.
+
+    Counters:
+    - misses:        no entry, plain request sent
+    - revalidations: entry present, conditional request sent
+    - hits:          backend answered 304, body served from cache
+    - refreshes:     backend answered 200 to a conditional request
+    - evictions:     entries dropped to stay under max_bytes
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "misses": 0,
+            "revalidations": 0,
+            "hits": 0,
+            "refreshes": 0,
+            "evictions": 0,
+        }
+
+    # ---- lookup ----
+
+    def lookup(self, key) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["revalidations"] += 1
+            return entry
+
+    @staticmethod
+    def conditional_headers(entry: _Entry | None) -> dict:
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def record_hit(self):
+        with self._lock:
+            self._stats["hits"] += 1
+
+    # ---- store ----
+
+    def store(self, key, response, revalidated: bool = False, content: bytes | None = None):
+        """
+        content: body of a streamed response (response.content is no
+        longer available once the stream has been consumed).
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        with self._lock:
+            if revalidated:
+                self._stats["refreshes"] += 1
+
+            self._drop(key)
+
+            # nothing to revalidate against -> caching would never pay off
+            if not etag and not last_modified:
+                return
+
+            if content is None:
+                content = response.content or b""
+            if len(content) > self.max_bytes:
+                return
+
+            entry = _Entry(etag, last_modified, content)
+            self._entries[key] = entry
+            self._bytes += entry.size
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.size
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ---- stats ----
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+
+_cache = ConditionalCache()
+
+
+def get_cache() -> ConditionalCache:
+    return _cache
+
+
+def credential_scope(token: str) -> str:
+    """
+    Short, non-reversible fingerprint of a bearer token.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(token: str, url: str) -> tuple:
+    """
+    Entries are scoped per credential: a user only ever revalidates
+    bodies that were fetched with their own token.
+    """
+    return credential_scope(token), url
@@ -1,12 +1,30 @@
 import os
-import requests
+import time
+from urllib.parse import quote, urlsplit
+
 import streamlit as st
 
+from api_breaker import breaker_state, get_breaker
+from api_cache import cache_key, get_cache
+from api_codec import ACCEPT_ENCODING, encode_body, loads
+from api_logging import configure_logging, log_error, log_response
+from api_metrics import get_metrics, start_metrics_server
+from api_transport import CONNECT_TIMEOUT, get_session, pool_stats, send
+from json_stream import JsonArrayStream
+from singleflight import single_flight_stats
+
 
 # -------------------------------------------------
 # Base config
 # -------------------------------------------------
 
+configure_logging()
+
+# Streaming ingestion of /mappings (see iter_mappings)
+STREAM_CHUNK = int(os.getenv("KIM_API_STREAM_CHUNK", str(256 * 1024)))
+PAGE_SIZE = int(os.getenv("KIM_API_PAGE_SIZE", "0"))  # 0 = unpaginated
+
+
 def _base_url():
     return os.getenv(
         "KIM_API_BASE_URL",
@@ -14,92 +32,158 @@ def _base_url():
     ).rstrip("/")
 
 
-def _headers():
+def _health_probe() -> bool:
+    """
+    Circuit-breaker probe: any non-5xx answer means the backend is up
+    (no auth needed, bypasses the breaker).
+    """
+    response = get_session().get(f"{_base_url()}/", timeout=(CONNECT_TIMEOUT, 5))
+    response.close()
+    return response.status_code < 500
+
+
+get_breaker().set_probe(_health_probe)
+
+
+def _token():
     token = st.session_state.get("access_token")
 
     if not token:
         raise RuntimeError("Not authenticated (no access_token in session_state)")
 
+    return token
+
+
+def _headers(token=None):
+    token = token or _token()
+
     return {
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
+        "Accept-Encoding": ACCEPT_ENCODING,
         "Content-Type": "application/json",
     }
 
 
 # -------------------------------------------------
-# CORE DEBUG REQUEST WRAPPER
+# CORE REQUEST WRAPPER
 # -------------------------------------------------
 
-def _request(method: str, path: str, payload=None):
+def _request(method: str, path: str, payload=None, conditional: bool = False, token=None, idempotent=None):
+    """
+    conditional=True (GET only): revalidate against the shared ETag cache
+    and serve the cached body when the backend answers 304.
+
+    token: explicit bearer token for calls made off the Streamlit script
+    thread (worker threads have no session_state).
+
+    idempotent: override whether the transport may retry (None = by verb).
+
+    Tracing goes through api_logging (off unless KIM_API_LOG_LEVEL is
+    INFO/DEBUG); errors are always logged.
+    """
     url = f"{_base_url()}{path}"
-    headers = _headers()
+    token = token or _token()
+    headers = _headers(token)
 
-    # ---- DEBUG: Outgoing request ----
-    print("\n" + "=" * 80)
-    print(f"[API REQUEST] {method} {url}")
-    print("Headers:", {k: v if k != "Authorization" else "Bearer ***" for k, v in headers.items()})
+    cache = get_cache() if conditional and method == "GET" else None
+    entry = None
+    if cache is not None:
+        key = cache_key(token, url)
+        entry = cache.lookup(key)
+        headers.update(cache.conditional_headers(entry))
+
+    body = None
     if payload is not None:
-        print("Payload:", payload)
+        body, extra = encode_body(payload)
+        headers.update(extra)
 
-    try:
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=payload if payload is not None else None,
-        )
+    response = None
+    start = time.perf_counter()
 
-        print(f"[API RESPONSE] Status: {response.status_code}")
+    try:
+        response = send(method, url, idempotent=idempotent, headers=headers, data=body)
+        elapsed_ms = (time.perf_counter() - start) * 1000
 
-        # Try printing JSON body
-        try:
-            body = response.json()
-        except Exception:
-            body = response.text
+        if cache is not None:
+            if response.status_code == 304 and entry is not None:
+                cache.record_hit()
+                log_response(method, path, response, elapsed_ms, cached=True)
+                _record(method, path, response, elapsed_ms)
+                return loads(entry.content) if entry.content else None
 
-        print("Response Body:", body if len(str(body)) < 2000 else str(body)[:2000] + " ...")
+            if response.ok:
+                cache.store(key, response, revalidated=entry is not None)
+            else:
+                cache.invalidate(key)
 
         response.raise_for_status()
 
-        return body if response.content else None
+        log_response(method, path, response, elapsed_ms, payload=payload)
+        _record(method, path, response, elapsed_ms, request_bytes=len(body or b""))
 
-    except requests.HTTPError as e:
-        print("❌ HTTP ERROR")
-        print("Status:", response.status_code)
-        print("Response Text:", response.text)
-        raise
+        if not response.content:
+            return None
+        try:
+            return loads(response.content)
+        except Exception:
+            return response.text
 
     except Exception as e:
-        print("❌ UNEXPECTED ERROR:", e)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log_error(method, path, e, response, elapsed_ms)
+        _record(method, path, response, elapsed_ms, request_bytes=len(body or b""), error=e)
         raise
 
-    finally:
-        print("=" * 80 + "\n")
+
+def _record(method, path, response, elapsed_ms, request_bytes=0, error=None):
+    """
+    Feed api_metrics. Response size is the on-the-wire (possibly
+    compressed) byte count when urllib3 exposes it.
+    """
+    if response is None:
+        get_metrics().record(method, path, type(error).__name__, elapsed_ms, request_bytes, error=True)
+        return
+
+    try:
+        wire = int(response.raw.tell())
+    except Exception:
+        wire = None
+
+    get_metrics().record(
+        method,
+        path,
+        response.status_code,
+        elapsed_ms,
+        request_bytes,
+        wire,
+        getattr(response, "retries", 0),
+        error=error is not None,
+    )
 
 
 # -------------------------------------------------
 # Thin wrappers
 # -------------------------------------------------
 
-def _get(path):
-    return _request("GET", path)
+def _get(path, conditional: bool = False, token=None):
+    return _request("GET", path, conditional=conditional, token=token)
 
 
-def _post(path, payload):
-    return _request("POST", path, payload)
+def _post(path, payload, token=None):
+    return _request("POST", path, payload, token=token)
 
 
-def _patch(path, payload):
-    return _request("PATCH", path, payload)
+def _patch(path, payload, token=None):
+    return _request("PATCH", path, payload, token=token)
 
 
-def _put(path, payload):
-    return _request("PUT", path, payload)
+def _put(path, payload, token=None, idempotent=None):
+    return _request("PUT", path, payload, token=token, idempotent=idempotent)
 
 
-def _delete(path):
-    return _request("DELETE", path)
+def _delete(path, token=None):
+    return _request("DELETE", path, token=token)
 
 
 # -------------------------------------------------
@@ -130,8 +214,8 @@ def create_project(
 
 
 
-def get_project(name):
-    return _get(f"/projects/{name}")
+def get_project(name, token=None):
+    return _get(f"/projects/{name}", token=token)
 
 
 def update_project_settings(project, payload: dict):
@@ -143,21 +227,273 @@ def update_project_settings(project, payload: dict):
 # Mappings
 # -------------------------------------------------
 
-def fetch_base_mapping(project):
-    return _get(f"/projects/{project}/mappings")
+def fetch_base_mapping(project, token=None):
+    """
+    The whole mapping list in one (ETag-revalidated) request. The app
+    loads mappings through data_store.load_catalog, which streams them
+    (iter_mappings) and coalesces concurrent loads.
+    """
+    return _get(f"/projects/{project}/mappings", conditional=True, token=token)
+
+
+def save_all_mappings(project, mappings, token=None):
+    # items without an id are creates: a retried batch would create them twice
+    idempotent = all(isinstance(m, dict) and m.get("id") for m in mappings)
+    return _put(f"/projects/{project}/mappings/batch", mappings, token=token, idempotent=idempotent)
+
+
+def create_mapping(project, payload, token=None):
+    return _post(f"/projects/{project}/mappings", payload, token=token)
+
+
+def update_mapping(project, mapping_id, payload, token=None):
+    return _put(f"/projects/{project}/mappings/{mapping_id}", payload, token=token)
+
+
+def delete_mapping(project, mapping_id, token=None):
+    return _delete(f"/projects/{project}/mappings/{mapping_id}", token=token)
+
+
+def iter_mappings(project, page_size: int = PAGE_SIZE, progress=None, token=None, meta=None):
+    """
+    Stream the project's mappings one dict at a time.
+
+    The body is parsed incrementally (json_stream), so the full response
+    is never held as one list. With page_size > 0 the backend is asked for
+    `?limit=<page_size>` pages and followed via `Link: rel="next"` or an
+    `X-Next-Cursor` header; without it a single (ETag-revalidated)
+    request is made.
+
+    progress(n_items, bytes_read, total_bytes | None) is called after
+    every chunk. If a `meta` dict is given, meta["etag"] and
+    meta["version"] are set from the (first) response's ETag and
+    X-Mappings-Version headers (the latter is the cursor for
+    fetch_mapping_changes), and meta["bytes"] to the body size once
+    the stream is exhausted.
+    """
+    token = token or _token()
+    base = f"/projects/{project}/mappings"
+    url = f"{_base_url()}{base}?limit={page_size}" if page_size else f"{_base_url()}{base}"
+    count = 0
+    read = 0
+
+    while url:
+        path = _page_path(url, base)
+        headers = _headers(token)
+
+        # only the unpaginated request is revalidated; pages are not cached
+        cache = get_cache() if not page_size else None
+        entry = None
+        if cache is not None:
+            key = cache_key(token, url)
+            entry = cache.lookup(key)
+            headers.update(cache.conditional_headers(entry))
+
+        response = None
+        start = time.perf_counter()
+
+        try:
+            response = send("GET", url, headers=headers, stream=True)
+
+            if cache is not None and response.status_code == 304 and entry is not None:
+                response.close()
+                cache.record_hit()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                log_response("GET", path, response, elapsed_ms, cached=True, nbytes=0)
+                _record("GET", path, response, elapsed_ms)
+                chunks = (
+                    entry.content[i:i + STREAM_CHUNK]
+                    for i in range(0, len(entry.content), STREAM_CHUNK)
+                )
+                total = entry.size
+            else:
+                response.raise_for_status()
+                chunks = response.iter_content(STREAM_CHUNK)
+                length = response.headers.get("Content-Length")
+                total = int(length) if length and not response.headers.get("Content-Encoding") else None
+        except Exception as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            log_error("GET", path, e, response, elapsed_ms)
+            _record("GET", path, response, elapsed_ms, error=e)
+            raise
+
+        if meta is not None and "etag" not in meta:
+            meta["etag"] = response.headers.get("ETag") or (entry.etag if response.status_code == 304 else None)
+            meta["version"] = response.headers.get("X-Mappings-Version")
+
+        # keep a raw copy for the ETag cache while it fits
+        tee = bytearray() if cache is not None and response.status_code != 304 else None
+        page_bytes = 0
+        parser = JsonArrayStream()
+
+        try:
+            for chunk in chunks:
+                page_bytes += len(chunk)
+                if tee is not None:
+                    if len(tee) + len(chunk) <= cache.max_bytes:
+                        tee += chunk
+                    else:
+                        tee = None
+
+                for item in parser.feed(chunk):
+                    count += 1
+                    yield item
+
+                if progress is not None:
+                    progress(count, read + page_bytes, total)
+
+            for item in parser.close():
+                count += 1
+                yield item
+        finally:
+            response.close()
+
+        read += page_bytes
+
+        if response.status_code != 304:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            log_response("GET", path, response, elapsed_ms, nbytes=page_bytes)
+            _record("GET", path, response, elapsed_ms)
+            if tee is not None:
+                cache.store(key, response, revalidated=entry is not None, content=bytes(tee))
+            elif cache is not None:
+                cache.invalidate(key)
+
+        url = _next_page(response, base, page_size) if page_size else None
+
+    if meta is not None:
+        meta["bytes"] = read
+
+
+def mappings_changed(project, etag: str | None, token=None) -> bool:
+    """
+    Whether the project's mapping set differs from the version with
+    `etag` (a conditional GET; the body is not read on a 200).
+    """
+    if not etag:
+        return True
+
+    path = f"/projects/{project}/mappings"
+    headers = {**_headers(token or _token()), "If-None-Match": etag}
+    response = None
+    start = time.perf_counter()
+
+    try:
+        response = send("GET", f"{_base_url()}{path}", headers=headers, stream=True)
+        response.close()
+        if response.status_code != 304:
+            response.raise_for_status()
+    except Exception as e:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log_error("GET", path, e, response, elapsed_ms)
+        _record("GET", path, response, elapsed_ms, error=e)
+        raise
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    log_response("GET", path, response, elapsed_ms, cached=response.status_code == 304, nbytes=0)
+    _record("GET", path, response, elapsed_ms)
+    return response.status_code != 304
+
+
+def fetch_mapping_changes(project, since: str, limit: int = 0, token=None, meta=None) -> dict | None:
+    """
+    Mappings changed since the mapping-set version `since` (an opaque
+    cursor from X-Mappings-Version or a previous call):
+
+        {"version": <new cursor>, "etag": ..., "upserts": [...], "deletes": [ids]}
+
+    With limit > 0 the backend may answer {"truncated": true, ...}
+    instead of sending more than `limit` changes. Returns None when the
+    backend has no history back to `since` (410) or no changes endpoint
+    (404); callers then fetch the full set. meta["bytes"] is set to the
+    body size.
+    """
+    path = f"/projects/{project}/mappings/changes?since={quote(str(since), safe='')}"
+    if limit:
+        path += f"&limit={limit}"
+    headers = _headers(token or _token())
+    response = None
+    start = time.perf_counter()
+
+    try:
+        response = send("GET", f"{_base_url()}{path}", headers=headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.status_code in (404, 410):
+            log_response("GET", path, response, elapsed_ms)
+            _record("GET", path, response, elapsed_ms)
+            return None
+        response.raise_for_status()
+    except Exception as e:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log_error("GET", path, e, response, elapsed_ms)
+        _record("GET", path, response, elapsed_ms, error=e)
+        raise
+
+    log_response("GET", path, response, elapsed_ms)
+    _record("GET", path, response, elapsed_ms)
+    if meta is not None:
+        meta["bytes"] = len(response.content)
+    return loads(response.content) if response.content else None
+
+
+def _next_page(response, base, page_size):
+    link = response.links.get("next", {}).get("url")
+    if link:
+        return link if link.startswith("http") else f"{_base_url()}{link}"
+
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        return f"{_base_url()}{base}?limit={page_size}&cursor={quote(cursor, safe='')}"
+
+    return None
+
+
+def _page_path(url, base):
+    """
+    The path a page is logged and measured under. Next links outside
+    the base URL (another host or prefix) keep the first page's endpoint.
+    """
+    root = _base_url()
+    if url.startswith(f"{root}/"):
+        return url[len(root):]
+    query = urlsplit(url).query
+    return f"{base}?{query}" if query else base
+
+
+# -------------------------------------------------
+# Cache / transport stats
+# -------------------------------------------------
+
+def cache_stats():
+    return get_cache().stats()
+
+
+def coalescing_stats():
+    return single_flight_stats()
+
+
+def backend_health():
+    return breaker_state()
+
+
+def metrics_snapshot() -> dict:
+    return get_metrics().snapshot()
 
 
-def save_all_mappings(project, mappings):
-    return _put(f"/projects/{project}/mappings/batch", mappings)
+def metrics_prometheus() -> str:
+    return get_metrics().to_prometheus()
 
 
-def create_mapping(project, payload):
-    return _post(f"/projects/{project}/mappings", payload)
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
 
 
-def update_mapping(project, mapping_id, payload):
-    return _put(f"/projects/{project}/mappings/{mapping_id}", payload)
+def _breaker_gauges():
+    state = breaker_state()
+    return {**state, "state_code": _BREAKER_STATES[state["state"]]}
 
 
-def delete_mapping(project, mapping_id):
-    return _delete(f"/projects/{project}/mappings/{mapping_id}")
+get_metrics().register_collector("pool", pool_stats)
+get_metrics().register_collector("cache", cache_stats)
+get_metrics().register_collector("coalescing", coalescing_stats)
+get_metrics().register_collector("breaker", _breaker_gauges)
+start_metrics_server()
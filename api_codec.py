@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+
+
+# -------------------------------------------------
+# JSON codec (fastest available, stdlib fallback)
+# -------------------------------------------------
+#
+# KIM_API_JSON_CODEC  auto (default) | orjson | msgspec | json
+
+def _stdlib_codec():
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return "json", json.loads, dumps
+
+
+def _orjson_codec():
+    import orjson
+
+    return "orjson", orjson.loads, orjson.dumps
+
+
+def _msgspec_codec():
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    return "msgspec", decoder.decode, encoder.encode
+
+
+_CODECS = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _stdlib_codec,
+}
+
+
+def _select_codec(name: str):
+    if name != "auto":
+        return _CODECS[name]()
+
+    for factory in (_orjson_codec, _msgspec_codec):
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _stdlib_codec()
+
+
+CODEC_NAME, loads, dumps = _select_codec(os.getenv("KIM_API_JSON_CODEC", "auto").lower())
+
+
+# -------------------------------------------------
+# Content-Encoding negotiation
+# -------------------------------------------------
+#
+# Only advertise encodings that the transport can actually decode:
+# urllib3 handles gzip/deflate always, br with brotli/brotlicffi
+# installed, zstd with zstandard installed (urllib3 >= 2).
+
+def _available_encodings() -> list[str]:
+    encodings = []
+
+    try:
+        import zstandard  # noqa: F401
+        import urllib3
+
+        if int(urllib3.__version__.split(".")[0]) >= 2:
+            encodings.append("zstd")
+    except ImportError:
+        pass
+
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+
+    encodings += ["gzip", "deflate"]
+    return encodings
+
+
+ACCEPT_ENCODING = ", ".join(_available_encodings())
+
+# Request bodies above this size are gzip-compressed (0 = never). Off by
+# default: only enable once the backend accepts Content-Encoding: gzip.
+GZIP_REQUEST_MIN_BYTES = int(os.getenv("KIM_API_GZIP_REQUEST_MIN_BYTES", "0"))
+
+
+def encode_body(payload) -> tuple[bytes, dict]:
+    """
+    Serialize a JSON payload; returns (body, extra_headers).
+    """
+    body = dumps(payload)
+
+    if GZIP_REQUEST_MIN_BYTES and len(body) >= GZIP_REQUEST_MIN_BYTES:
+        return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+
+    return body, {}
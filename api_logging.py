@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import random
+import reprlib
+from datetime import datetime, timezone
+
+
+# -------------------------------------------------
+# Config (env overridable)
+# -------------------------------------------------
+#
+# KIM_API_LOG_LEVEL    WARNING (default) | INFO | DEBUG
+#                      DEBUG traces every sampled request, INFO only
+#                      method/endpoint/status/timing, WARNING only errors.
+# KIM_API_LOG_SAMPLE   "1" or per-endpoint rates, e.g.
+#                      "GET /projects/{project}/mappings=0.05,*=1"
+# KIM_API_LOG_PREVIEW  max bytes of a body shown in a trace (default 512)
+
+LOGGER_NAME = "kim.api"
+LOG_LEVEL = os.getenv("KIM_API_LOG_LEVEL", "WARNING").upper()
+PREVIEW_BYTES = int(os.getenv("KIM_API_LOG_PREVIEW", "512"))
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+# -------------------------------------------------
+# Endpoint templates
+# -------------------------------------------------
+
+_LITERAL_SEGMENTS = {
+    "projects", "mappings", "batch", "config", "changes", "me", "auth", "login",
+}
+_PARAM_NAMES = {
+    "projects": "{project}",
+    "mappings": "{mapping_id}",
+}
+
+
+def endpoint_template(path: str) -> str:
+    """
+    /projects/icu_2026/mappings/42 -> /projects/{project}/mappings/{mapping_id}
+    """
+    path = path.split("?", 1)[0]
+    out = []
+    prev = None
+
+    for seg in path.strip("/").split("/"):
+        if not seg:
+            continue
+        if seg in _LITERAL_SEGMENTS:
+            out.append(seg)
+        else:
+            out.append(_PARAM_NAMES.get(prev, "{id}"))
+        prev = seg
+
+    return "/" + "/".join(out)
+
+
+# -------------------------------------------------
+# Sampling
+# -------------------------------------------------
+
+def _parse_sample_rates(raw: str) -> dict:
+    rates = {}
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            key, value = part.rsplit("=", 1)
+        else:
+            key, value = "*", part
+        try:
+            rates[key.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+_sample_rates = _parse_sample_rates(os.getenv("KIM_API_LOG_SAMPLE", "1"))
+
+
+def set_sample_rate(endpoint: str, rate: float):
+    """
+    endpoint: "METHOD /template", "/template" (any method) or "*".
+    """
+    _sample_rates[endpoint] = max(0.0, min(1.0, float(rate)))
+
+
+def _sampled(method: str, template: str) -> bool:
+    rate = _sample_rates.get(
+        f"{method} {template}",
+        _sample_rates.get(template, _sample_rates.get("*", 1.0)),
+    )
+    if rate >= 1.0:
+        return True
+    return rate > 0.0 and random.random() < rate
+
+
+# -------------------------------------------------
+# Lazy, bounded previews
+# -------------------------------------------------
+
+class BodyPreview:
+    """
+    Formats at most `limit` bytes of a raw body, and only when a handler
+    actually renders the record. The full body is never decoded or
+    stringified.
+    """
+
+    __slots__ = ("content", "limit")
+
+    def __init__(self, content: bytes | None, limit: int = PREVIEW_BYTES):
+        self.content = content or b""
+        self.limit = limit
+
+    def __str__(self):
+        head = self.content[:self.limit].decode("utf-8", errors="replace")
+        rest = len(self.content) - self.limit
+        return head if rest <= 0 else f"{head} ... (+{rest} bytes)"
+
+
+class PayloadPreview:
+    """
+    Bounded repr of an outgoing JSON payload (lists/dicts are truncated).
+    """
+
+    __slots__ = ("payload",)
+
+    _repr = reprlib.Repr()
+    _repr.maxlevel = 3
+    _repr.maxlist = 5
+    _repr.maxdict = 8
+    _repr.maxstring = 80
+    _repr.maxother = 80
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return self._repr.repr(self.payload)
+
+
+# -------------------------------------------------
+# Structured formatter
+# -------------------------------------------------
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, event + the record's `api` fields.
+    """
+
+    def format(self, record):
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        for k, v in (getattr(record, "api", None) or {}).items():
+            doc[k] = v if isinstance(v, (str, int, float, bool, type(None))) else str(v)
+        return json.dumps(doc, ensure_ascii=False)
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """
+    Idempotent. Installs a JSON stderr handler on the `kim.api` logger
+    unless the host application already configured one.
+    """
+    logger.setLevel(getattr(logging, level, logging.WARNING))
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+# -------------------------------------------------
+# Events used by api_client
+# -------------------------------------------------
+
+def log_response(method: str, path: str, response, elapsed_ms: float, payload=None, cached: bool = False, nbytes=None):
+    """
+    Success path: INFO summary, DEBUG adds header-free body previews.
+    Sampled per endpoint; nothing is built when the level is disabled.
+
+    nbytes: body size of a streamed response, whose content has already
+    been consumed (no body preview is logged then).
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    template = endpoint_template(path)
+    if not _sampled(method, template):
+        return
+
+    fields = {
+        "method": method,
+        "endpoint": template,
+        "path": path,
+        "status": response.status_code,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "bytes": nbytes if nbytes is not None else len(response.content or b""),
+        "retries": getattr(response, "retries", 0),
+        "cached": cached,
+    }
+
+    if logger.isEnabledFor(logging.DEBUG):
+        if payload is not None:
+            fields["payload"] = PayloadPreview(payload)
+        if nbytes is None:
+            fields["body"] = BodyPreview(response.content)
+        logger.debug("api_response", extra={"api": fields})
+    else:
+        logger.info("api_response", extra={"api": fields})
+
+
+def log_error(method: str, path: str, error: Exception, response=None, elapsed_ms: float | None = None):
+    """
+    Errors are never sampled.
+    """
+    if not logger.isEnabledFor(logging.WARNING):
+        return
+
+    fields = {
+        "method": method,
+        "endpoint": endpoint_template(path),
+        "path": path,
+        "error": f"{type(error).__name__}: {error}",
+    }
+    if elapsed_ms is not None:
+        fields["elapsed_ms"] = round(elapsed_ms, 2)
+    if response is not None:
+        fields["status"] = response.status_code
+        fields["body"] = BodyPreview(response.content)
+
+    logger.warning("api_error", extra={"api": fields})
@@ -0,0 +1,291 @@
+import bisect
+import json
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api_logging import endpoint_template
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+# Optional Prometheus scrape endpoint (0 = off); unauthenticated, so it
+# only listens on loopback unless KIM_METRICS_HOST says otherwise
+METRICS_PORT = int(os.getenv("KIM_METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("KIM_METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+SIZE_BUCKETS_BYTES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+# -------------------------------------------------
+# Histogram
+# -------------------------------------------------
+
+class Histogram:
+    """
+    Fixed-bucket histogram (Prometheus semantics: cumulative `le` buckets).
+    Quantiles are estimated by linear interpolation inside the bucket.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "min", "max")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            if seen + c >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * ((rank - seen) / c)
+            seen += c
+        return self.max
+
+    def cumulative(self):
+        total = 0
+        for bound, c in zip(self.bounds + ("+Inf",), self.counts):
+            total += c
+            yield bound, total
+
+
+# -------------------------------------------------
+# Per-endpoint stats
+# -------------------------------------------------
+
+class EndpointStats:
+    __slots__ = ("latency_ms", "response_bytes", "request_bytes", "statuses", "retries", "errors")
+
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.response_bytes = Histogram(SIZE_BUCKETS_BYTES)
+        self.request_bytes = 0
+        self.statuses = Counter()
+        self.retries = 0
+        self.errors = 0
+
+
+class ApiMetrics:
+    """
+    Process-wide request metrics keyed by (method, endpoint template).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: dict = {}
+        self._collectors: dict = {}
+
+    def record(
+        self,
+        method: str,
+        path: str,
+        status,
+        elapsed_ms: float,
+        request_bytes: int = 0,
+        response_bytes: int | None = None,
+        retries: int = 0,
+        error: bool = False,
+    ):
+        """
+        status: HTTP status code, or the exception class name when the
+        request never got a response.
+        """
+        key = (method, endpoint_template(path))
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats()
+
+            stats.latency_ms.observe(elapsed_ms)
+            if response_bytes is not None:
+                stats.response_bytes.observe(response_bytes)
+            stats.request_bytes += request_bytes
+            stats.statuses[str(status)] += 1
+            stats.retries += retries
+            stats.errors += int(error)
+
+    def register_collector(self, name: str, fn):
+        """
+        fn() -> dict of numeric values, exported as kim_api_<name>_<key>.
+        """
+        self._collectors[name] = fn
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    # ---- exports ----
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = []
+            for (method, template), s in sorted(self._endpoints.items()):
+                lat = s.latency_ms
+                endpoints.append({
+                    "method": method,
+                    "endpoint": template,
+                    "requests": lat.count,
+                    "errors": s.errors,
+                    "retries": s.retries,
+                    "statuses": dict(s.statuses),
+                    "p50_ms": _round(lat.quantile(0.50)),
+                    "p95_ms": _round(lat.quantile(0.95)),
+                    "p99_ms": _round(lat.quantile(0.99)),
+                    "max_ms": _round(lat.max),
+                    "mean_ms": _round(lat.sum / lat.count) if lat.count else None,
+                    "response_bytes_total": int(s.response_bytes.sum),
+                    "response_bytes_p95": _round(s.response_bytes.quantile(0.95)),
+                    "request_bytes_total": s.request_bytes,
+                })
+
+        return {
+            "endpoints": endpoints,
+            **{name: _safe_collect(fn) for name, fn in self._collectors.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            items = sorted(self._endpoints.items())
+
+            family("kim_api_request_duration_ms", "histogram", "Frontend-observed API latency")
+            for (method, template), s in items:
+                labels = f'method="{method}",endpoint="{template}"'
+                for bound, total in s.latency_ms.cumulative():
+                    lines.append(f'kim_api_request_duration_ms_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"kim_api_request_duration_ms_sum{{{labels}}} {s.latency_ms.sum:.3f}")
+                lines.append(f"kim_api_request_duration_ms_count{{{labels}}} {s.latency_ms.count}")
+
+            family("kim_api_response_bytes", "histogram", "Response body size")
+            for (method, template), s in items:
+                labels = f'method="{method}",endpoint="{template}"'
+                for bound, total in s.response_bytes.cumulative():
+                    lines.append(f'kim_api_response_bytes_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"kim_api_response_bytes_sum{{{labels}}} {int(s.response_bytes.sum)}")
+                lines.append(f"kim_api_response_bytes_count{{{labels}}} {s.response_bytes.count}")
+
+            family("kim_api_request_bytes_total", "counter", "Request body bytes sent")
+            for (method, template), s in items:
+                lines.append(f'kim_api_request_bytes_total{{method="{method}",endpoint="{template}"}} {s.request_bytes}')
+
+            family("kim_api_responses_total", "counter", "Responses by status")
+            for (method, template), s in items:
+                for status, n in sorted(s.statuses.items()):
+                    lines.append(
+                        f'kim_api_responses_total{{method="{method}",endpoint="{template}",status="{status}"}} {n}'
+                    )
+
+            family("kim_api_retries_total", "counter", "Transport retries")
+            for (method, template), s in items:
+                lines.append(f'kim_api_retries_total{{method="{method}",endpoint="{template}"}} {s.retries}')
+
+        for name, fn in self._collectors.items():
+            for key, value in _safe_collect(fn).items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"kim_api_{name}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _safe_collect(fn) -> dict:
+    try:
+        return dict(fn())
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+
+_metrics = ApiMetrics()
+
+
+def get_metrics() -> ApiMetrics:
+    return _metrics
+
+
+# -------------------------------------------------
+# Optional scrape endpoint
+# -------------------------------------------------
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json on `host`:`port`
+    from a daemon thread. Idempotent; no-op when port is 0.
+    """
+    global _server
+
+    if not port:
+        return None
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(_metrics.snapshot(), default=str).encode("utf-8")
+                ctype = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = _metrics.to_prometheus().encode("utf-8")
+                ctype = "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _Handler)
+            except OSError:
+                # another Streamlit worker in this host already serves it
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="kim-metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,201 @@
+import os
+import random
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_breaker import get_breaker
+
+
+# -------------------------------------------------
+# Config (env overridable)
+# -------------------------------------------------
+
+POOL_SIZE = int(os.getenv("KIM_API_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.getenv("KIM_API_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("KIM_API_READ_TIMEOUT", "60"))
+
+MAX_RETRIES = int(os.getenv("KIM_API_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("KIM_API_BACKOFF_BASE", "0.25"))
+BACKOFF_CAP = float(os.getenv("KIM_API_BACKOFF_CAP", "4"))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+# -------------------------------------------------
+# Process-wide pooled session
+# -------------------------------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+
+    # The session is shared by every Streamlit user, so it must never
+    # carry per-user state. Auth goes in per-request headers and cookies
+    # (e.g. Azure ARR affinity) are refused instead of being replayed.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        max_retries=0,
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+
+    return _session
+
+
+def reset_session():
+    """
+    Drop the shared session (closes pooled connections).
+    Mainly for benchmarks and config changes at runtime.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+# -------------------------------------------------
+# Retry policy
+# -------------------------------------------------
+
+def _backoff_delay(attempt: int) -> float:
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(BACKOFF_CAP, max(0.0, float(value)))
+    except ValueError:
+        return None
+
+
+def send(method: str, url: str, idempotent: bool | None = None, **kwargs) -> requests.Response:
+    """
+    Send a request over the shared pool.
+
+    - connect/read timeouts are always set
+    - idempotent verbs are retried on connection errors, timeouts and
+      429/502/503/504 with jittered exponential backoff
+    - non-idempotent verbs (POST, PATCH) are sent exactly once; callers
+      pass idempotent=False for a request whose verb is idempotent but
+      whose body is not (e.g. a batch PUT containing creates)
+    - the whole call (including retries) is one outcome for the circuit
+      breaker; while it is open this raises CircuitOpenError immediately
+
+    The returned response carries the number of retries used as
+    `response.retries`.
+    """
+    method = method.upper()
+    session = get_session()
+    breaker = get_breaker()
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    retries = MAX_RETRIES if idempotent else 0
+    attempt = 0
+
+    breaker.before_call()
+    start = time.monotonic()
+
+    try:
+        while True:
+            try:
+                response = session.request(method=method, url=url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                time.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                delay = _retry_after(response)
+                response.close()
+                time.sleep(delay if delay is not None else _backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            break
+    except (requests.ConnectionError, requests.Timeout) as e:
+        breaker.record_failure(type(e).__name__)
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure(f"HTTP {response.status_code}")
+    else:
+        breaker.record_success(time.monotonic() - start)
+
+    response.retries = attempt
+    return response
+
+
+# -------------------------------------------------
+# Pool statistics
+# -------------------------------------------------
+
+def pool_stats() -> dict:
+    """
+    Connection reuse across all pooled hosts.
+
+    `hits` are requests served on an already-open keep-alive connection,
+    `misses` are requests that had to open a new TCP(+TLS) connection.
+    """
+    requests_total = 0
+    new_connections = 0
+    hosts = []
+
+    session = _session
+    if session is not None:
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_total += pool.num_requests
+                new_connections += pool.num_connections
+                hosts.append(f"{pool.scheme}://{pool.host}:{pool.port}")
+
+    return {
+        "pool_size": POOL_SIZE,
+        "hosts": hosts,
+        "requests": requests_total,
+        "misses": new_connections,
+        "hits": max(0, requests_total - new_connections),
+    }
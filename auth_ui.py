@@ -1,5 +1,41 @@
+from datetime import datetime
+
 import streamlit as st
-from iam_workflow import get_token, login_button, clear_auth
+from api_breaker import breaker_state
+from iam_workflow import (
+    clear_auth,
+    get_token,
+    login_button,
+    render_api_debug,
+    render_auth_debug,
+)
+
+
+def render_backend_status():
+    """
+    Sidebar indicator for the API circuit breaker and stale data.
+    """
+    health = breaker_state()
+    state = health["state"]
+
+    with st.sidebar:
+        if state == "open":
+            st.error(
+                f"🔴 Backend unavailable – retrying in {health['retry_in_s']:.0f}s"
+            )
+        elif state == "half_open":
+            st.warning("🟠 Backend recovering…")
+        else:
+            st.caption("🟢 Backend connected")
+
+        stale = st.session_state.get("catalog_stale")
+        if stale:
+            as_of = datetime.fromtimestamp(stale["as_of"]).strftime("%H:%M:%S")
+            st.warning(
+                f"Showing the last loaded catalog ({as_of}). "
+                "It will refresh automatically once the backend is back."
+            )
+
 
 def render_auth_status():
     token = get_token()
@@ -11,6 +47,12 @@ def render_auth_status():
         who = name or login or "GitHub user"
 
         st.success(f"✅ Logged in as {who}")
+        render_backend_status()
+
+        if st.session_state.get("debug", False):
+            with st.sidebar:
+                render_auth_debug()
+                render_api_debug()
 
         if st.button("Logout"):
             clear_auth()
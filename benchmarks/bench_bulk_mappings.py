@@ -0,0 +1,74 @@
+"""
+Throughput of 1k mapping operations against stub_backend.
+
+    python benchmarks/bench_bulk_mappings.py [n_ops] [latency_ms]
+
+Compares the serial sync client (one create_mapping per item) with
+api_async.run_mapping_ops at several concurrency levels and with the
+/mappings/batch fallback. The stub adds a fixed per-request latency to
+stand in for the round trip to the backend.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_backend import StubBackend  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    stub = StubBackend(project="bench", latency_ms=latency_ms).start()
+    os.environ["KIM_API_BASE_URL"] = stub.url
+
+    import api_async
+    import api_client
+    from api_transport import pool_stats
+
+    token = "bench"
+    payloads = [
+        {
+            "name": f"Variable {i}",
+            "unit": "mmHg",
+            "classification": {"path": ["Bench", f"Group {i % 10}"]},
+            "source": [{"system": "EPIC", "variable": f"EPIC_{i}"}],
+        }
+        for i in range(n)
+    ]
+    ops = [api_async.MappingOp(api_async.CREATE, payload=p) for p in payloads]
+
+    def report(label, seconds, results=None):
+        extra = ""
+        if results is not None:
+            s = api_async.summarize(results)
+            extra = f"  ok={s['ok']} failed={s['failed']} batched={s['batched']}"
+        print(f"{label:<28} {seconds:7.2f} s  {n / seconds:8.0f} ops/s{extra}")
+
+    print(f"{n} creates, {latency_ms:.0f} ms simulated backend latency")
+
+    serial_n = min(n, 200)
+    start = time.perf_counter()
+    for p in payloads[:serial_n]:
+        api_client.create_mapping("bench", p, token=token)
+    serial = (time.perf_counter() - start) * n / serial_n
+    report(f"serial (extrapolated {serial_n})", serial)
+
+    for concurrency in (8, 16, 32):
+        start = time.perf_counter()
+        results = asyncio.run(api_async.run_mapping_ops("bench", ops, token, concurrency, use_batch=False))
+        report(f"async concurrency={concurrency}", time.perf_counter() - start, results)
+
+    start = time.perf_counter()
+    results = asyncio.run(api_async.run_mapping_ops("bench", ops, token, use_batch=True))
+    report("batch endpoint", time.perf_counter() - start, results)
+
+    print("pool:", pool_stats())
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bytes on the wire and decode time for mapping payloads.
+
+    python benchmarks/bench_codec.py [sizes...]
+
+For synthetic projects of 10k-200k mappings, reports the response size
+per Content-Encoding (identity, gzip, and br/zstd when installed) and the
+time each available JSON codec needs to decode / encode it.
+"""
+import gc
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_codec  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+def _compressors():
+    out = {"identity": lambda b: b, "gzip": lambda b: gzip.compress(b, compresslevel=6)}
+    try:
+        import brotli
+        out["br"] = lambda b: brotli.compress(b, quality=5)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        out["zstd"] = zstandard.ZstdCompressor(level=3).compress
+    except ImportError:
+        pass
+    return out
+
+
+def _codecs():
+    out = {}
+    for name, factory in api_codec._CODECS.items():
+        try:
+            out[name] = factory()
+        except ImportError:
+            continue
+    return out
+
+
+def _time(fn, arg, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn(arg)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best * 1000
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000, 200_000]
+    compressors = _compressors()
+    codecs = _codecs()
+
+    print(f"selected codec: {api_codec.CODEC_NAME}, Accept-Encoding: {api_codec.ACCEPT_ENCODING}")
+
+    for n in sizes:
+        data = generate_mappings(n)
+        raw = json.dumps(data).encode("utf-8")
+
+        print(f"\n{n:,} mappings")
+        for name, compress in compressors.items():
+            start = time.perf_counter()
+            wire = compress(raw)
+            ms = (time.perf_counter() - start) * 1000
+            print(f"  {name:<9} {len(wire) / 1e6:8.2f} MB  ({len(wire) / len(raw):6.1%}, compress {ms:7.1f} ms)")
+
+        for name, (_, codec_loads, codec_dumps) in codecs.items():
+            dec = _time(codec_loads, raw)
+            enc = _time(codec_dumps, data)
+            print(f"  {name:<9} decode {dec:8.1f} ms   encode {enc:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Picking up a few backend changes to a loaded project.
+
+    python benchmarks/bench_delta_sync.py [n_mappings] [n_changed]
+
+Before: any change meant refetching and rebuilding the whole mapping set.
+After: data_store.sync_catalog() asks /mappings/changes for what changed
+since the catalog's version and merges it. Runs against stub_backend.
+"""
+import copy
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["KIM_CATALOG_SNAPSHOT_DIR"] = ""
+logging.disable(logging.WARNING)
+
+from stub_backend import StubBackend, generate_mappings  # noqa: E402
+
+
+def _change(state, project, n_changed, round_):
+    with state.lock:
+        for i in range(n_changed):
+            m = copy.deepcopy(project.mappings[f"m{i:07d}"])
+            m["name"] = f"{m['name']} (edit {round_})"
+            project.mappings[m["id"]] = m
+            project.touch(m["id"])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_changed = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with StubBackend(mappings=generate_mappings(n), project="bench") as stub:
+        os.environ["KIM_API_BASE_URL"] = stub.url
+        import streamlit as st
+
+        import data_store
+        from catalog import get_catalogs
+        from catalog_sync import get_sync_stats
+
+        st.session_state["access_token"] = "bench"
+        project = stub.state.projects["bench"]
+        print(f"{n:,} mappings, {n_changed} changed on the backend")
+
+        start = time.perf_counter()
+        data_store.load_catalog("bench")
+        print(f"  initial load                       {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+        _change(stub.state, project, n_changed, 1)
+        get_catalogs().invalidate("bench")
+        start = time.perf_counter()
+        data_store.load_catalog("bench")
+        full_bytes, _ = get_sync_stats().cost("bench")
+        print(
+            f"  full refetch (before)              {(time.perf_counter() - start) * 1000:9.1f} ms"
+            f"  {full_bytes / 1e6:8.2f} MB"
+        )
+
+        _change(stub.state, project, n_changed, 2)
+        start = time.perf_counter()
+        data_store.sync_catalog("bench", "bench")
+        last = get_sync_stats().last
+        print(
+            f"  delta sync (after)                 {(time.perf_counter() - start) * 1000:9.1f} ms"
+            f"  {last['bytes'] / 1e6:8.2f} MB  ({last['changes']} changes)"
+        )
+        print(f"  saved: {last['bytes_saved'] / 1e6:.2f} MB, {last['seconds_saved'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory held by the variable tree's leaf lookup.
+
+    python benchmarks/bench_leaf_lookup.py [n_mappings] [n_sessions]
+
+Before: build_nodes_and_lookup returned {leaf value: row dict}, one dict
+of Python objects per leaf, stashed in st.session_state["leaf_lookup_master"]
+(per session before the tree cache, per cached tree since).
+After: tree_utils.LeafLookup keeps leaf value -> row position into the
+shared catalog frame; row dicts are built on access.
+
+Reports traced heap (tracemalloc) per lookup and per session.
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapping_columns import mappings_to_df  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+from tree_utils import build_nodes_and_lookup  # noqa: E402
+
+
+def row_dicts(df, lookup):
+    """
+    The old lookup: every leaf's row as a dict (built from column lists).
+    """
+    rows = [lookup.position(v) for v in lookup]
+    columns = list(df.columns)
+    column_values = [df[c].take(rows).tolist() for c in columns]
+    return {v: dict(zip(columns, record)) for v, record in zip(lookup, zip(*column_values))}
+
+
+def _heap(make):
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    value = make()
+    gc.collect()
+    return value, (tracemalloc.get_traced_memory()[0] - before) / 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    df = mappings_to_df(generate_mappings(n, depth=(2, 4)))
+    nodes, lookup = build_nodes_and_lookup(df)
+    print(f"{n:,} mappings, {len(lookup):,} leaves, {n_sessions} sessions")
+
+    tracemalloc.start()
+    old, old_mb = _heap(lambda: row_dicts(df, lookup))
+    del old
+    _, new_mb = _heap(lambda: build_nodes_and_lookup(df)[1])
+    _, nodes_mb = _heap(lambda: build_nodes_and_lookup(df)[0])
+    print(f"  {'row dicts (before)':<34} {old_mb:9.2f} MB")
+    print(f"  {'LeafLookup (after)':<34} {new_mb:9.2f} MB   (tree nodes: {nodes_mb:.2f} MB)")
+
+    sessions, per_session = _heap(
+        lambda: [{"leaf_lookup_master": row_dicts(df, lookup)} for _ in range(n_sessions)]
+    )
+    print(f"  {'per-session row dicts (before)':<34} {per_session / n_sessions:9.2f} MB heap/session")
+    del sessions
+    sessions, per_session = _heap(lambda: [{"leaf_lookup_master": lookup} for _ in range(n_sessions)])
+    print(f"  {'per-session shared LeafLookup':<34} {per_session / n_sessions:9.2f} MB heap/session")
+    tracemalloc.stop()
+
+    values = list(lookup)[:1000]
+    start = time.perf_counter()
+    for v in values:
+        lookup[v]
+    print(f"  row access on demand               {(time.perf_counter() - start) / len(values) * 1e6:9.1f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Mapping list -> master DataFrame conversion at scale.
+
+    python benchmarks/bench_mapping_frame.py [sizes...]
+
+Compares the original row-dict implementation of
+data_store.backend_mappings_to_df (copied below) with the columnar
+mapping_columns.mappings_to_df at 10k/100k/500k mappings: build time and
+resulting frame memory (deep).
+"""
+import gc
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapping_columns import EXPECTED_COLUMNS, mappings_to_df  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+def legacy_mappings_to_df(mappings: list[dict]) -> pd.DataFrame:
+    rows = []
+    for m in mappings:
+        classification = m.get("classification") or {}
+        path = classification.get("path") or []
+
+        organ_system = path[0] if len(path) > 0 else "General"
+        group = path[1] if len(path) > 1 else "General"
+
+        epic_id = ""
+        pdms_id = ""
+        for src in m.get("source") or []:
+            system = (src.get("system") or "").upper()
+            variable = src.get("variable") or ""
+            if system == "EPIC":
+                epic_id = variable
+            elif system == "PDMS":
+                pdms_id = variable
+
+        rows.append({
+            "Organ System": organ_system,
+            "Group": group,
+            "Variable": m.get("name", ""),
+            "EPIC ID": epic_id,
+            "PDMS ID": pdms_id,
+            "Unit": m.get("unit", ""),
+            "__row_key__": m.get("id"),
+        })
+
+    df = pd.DataFrame(rows)
+    for col in EXPECTED_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+def _time(fn, arg, repeat: int):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        out = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            out = fn(arg)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best * 1000, out
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 500_000]
+    print(f"pandas {pd.__version__}")
+
+    for n in sizes:
+        mappings = generate_mappings(n)
+        repeat = 5 if n <= 100_000 else 2
+
+        old_ms, old_df = _time(legacy_mappings_to_df, mappings, repeat)
+        new_ms, new_df = _time(mappings_to_df, mappings, repeat)
+
+        old_mb = old_df.memory_usage(deep=True).sum() / 1e6
+        new_mb = new_df.memory_usage(deep=True).sum() / 1e6
+
+        print(f"\n{n:,} mappings")
+        print(f"  row dicts   {old_ms:9.1f} ms   {old_mb:8.1f} MB")
+        print(f"  columnar    {new_ms:9.1f} ms   {new_mb:8.1f} MB   ({old_ms / new_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
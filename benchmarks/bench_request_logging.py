@@ -0,0 +1,98 @@
+"""
+Per-fetch tracing overhead on a 50k-mapping response.
+
+    python benchmarks/bench_request_logging.py [n_mappings]
+
+Compares the old print-based trace in api_client._request (str(body)
+for the length check and again for the preview, written to stdout)
+against api_logging at the production default (WARNING) and at DEBUG
+with a 10% sample rate. Both variants include the json decode that the
+request itself needs, so the difference is the pure logging cost.
+"""
+import gc
+import io
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_logging  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.status_code = 200
+        self.retries = 0
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _payload(n: int) -> bytes:
+    return json.dumps(generate_mappings(n)).encode("utf-8")
+
+
+def _old_trace(response):
+    body = response.json()
+    print("[API RESPONSE] Status:", response.status_code)
+    print("Response Body:", body if len(str(body)) < 2000 else str(body)[:2000] + " ...")
+    return body
+
+
+def _new_trace(response):
+    body = response.json()
+    api_logging.log_response("GET", "/projects/demo/mappings", response, 1.0)
+    return body
+
+
+def _time(fn, response, repeat: int) -> float:
+    total = 0.0
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn(response)
+            total += time.perf_counter() - start
+        finally:
+            gc.enable()
+    return total / repeat * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    repeat = 10
+    response = _FakeResponse(_payload(n))
+
+    api_logging.logger.handlers[:] = [logging.StreamHandler(io.StringIO())]
+    api_logging.logger.handlers[0].setFormatter(api_logging.JsonFormatter())
+    api_logging.logger.propagate = False
+
+    with redirect_stdout(io.StringIO()):
+        old_ms = _time(_old_trace, response, repeat)
+
+    api_logging.logger.setLevel(logging.WARNING)
+    new_off_ms = _time(_new_trace, response, repeat)
+
+    api_logging.logger.setLevel(logging.DEBUG)
+    api_logging.set_sample_rate("*", 0.1)
+    new_debug_ms = _time(_new_trace, response, repeat)
+
+    decode_ms = _time(lambda r: r.json(), response, repeat)
+
+    print(f"payload: {n} mappings, {len(response.content) / 1e6:.1f} MB")
+    print(f"json decode only:           {decode_ms:8.1f} ms")
+    print(f"old print trace:            {old_ms:8.1f} ms  (+{old_ms - decode_ms:.1f} ms logging)")
+    print(f"api_logging WARNING (prod): {new_off_ms:8.1f} ms  (+{new_off_ms - decode_ms:.1f} ms logging)")
+    print(f"api_logging DEBUG, 10%:     {new_debug_ms:8.1f} ms  (+{new_debug_ms - decode_ms:.1f} ms logging)")
+    print(f"saved per fetch (prod):     {old_ms - new_off_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Resolving selected leaves against the master catalog.
+
+    python benchmarks/bench_row_index.py [n_mappings] [n_selected]
+
+Before: pages/3_b_granularity.py scanned the frame once per selected
+row key (master_df.loc[master_df["__row_key__"] == key]) and the
+choose-variable page rebuilt set(df["__row_key__"].astype(str)) every
+rerun. After: one catalog.RowIndex per catalog version, queried by key.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import RowIndex  # noqa: E402
+from mapping_columns import mappings_to_df  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_selected = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    df = mappings_to_df(generate_mappings(n))
+    selected = random.Random(0).sample(df["__row_key__"].tolist(), n_selected)
+
+    print(f"{n:,} mappings, {n_selected:,} selected")
+
+    start = time.perf_counter()
+    found = sum(not df.loc[df["__row_key__"] == key].empty for key in selected)
+    print(f"  per-key scan (old granularity)   {(time.perf_counter() - start) * 1000:9.1f} ms  found={found}")
+
+    start = time.perf_counter()
+    valid = set(df["__row_key__"].astype(str))
+    print(f"  rebuild key set (old choose)     {(time.perf_counter() - start) * 1000:9.1f} ms per rerun")
+
+    start = time.perf_counter()
+    index = RowIndex(df)
+    print(f"  build RowIndex (once/version)    {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    start = time.perf_counter()
+    found = sum(key in index for key in selected)
+    print(f"  membership via index             {(time.perf_counter() - start) * 1000:9.3f} ms  found={found}")
+
+    start = time.perf_counter()
+    rows = index.rows(selected)
+    print(f"  rows(selected) via index         {(time.perf_counter() - start) * 1000:9.3f} ms  rows={len(rows)}")
+
+    epic = df["EPIC ID"].iloc[0]
+    index.by_source("EPIC", epic)
+    start = time.perf_counter()
+    hits = index.by_source("EPIC", epic)
+    print(f"  by_source(EPIC) (after warm-up)  {(time.perf_counter() - start) * 1000:9.3f} ms  rows={len(hits)}")
+    assert len(valid) == len(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Searching the variable catalog.
+
+    python benchmarks/bench_search.py [n_mappings]
+
+Before: the page told users to press Ctrl+F, which only finds what the
+browser has rendered (nothing inside collapsed branches); a server-side
+scan would be a case-insensitive str.contains over every searched column.
+After: search_index.SearchIndex, built once per catalog version in the
+background; queries hit the token/prefix/substring/trigram lookups.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from mapping_columns import mappings_to_df  # noqa: E402
+from mapping_store import build_store  # noqa: E402
+from search_index import SEARCH_FIELDS, SearchIndex, tokenize  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+def scan(df, query):
+    """
+    Baseline: rows where every term occurs in one of the searched columns.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for term in tokenize(query):
+        hit = np.zeros(len(df), dtype=bool)
+        for column in SEARCH_FIELDS + ("Organ System", "Group"):
+            hit |= df[column].astype(str).str.casefold().str.contains(term, regex=False).to_numpy()
+        mask &= hit
+    return np.flatnonzero(mask)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    mappings = generate_mappings(n, depth=(2, 4))
+    df = mappings_to_df(mappings)
+    store = build_store(mappings)
+    paths = [store.get(k).path for k in df["__row_key__"].tolist()]
+
+    start = time.perf_counter()
+    index = SearchIndex(df, paths)
+    print(f"{n:,} rows, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    queries = [
+        "heart",
+        "heart rate",
+        mappings[n // 2]["source"][0]["variable"],
+        "PDMS.CARD",
+        "mmHg",
+        "laktate",
+    ]
+    print(f"  {'query':24} {'matches':>8} {'scan (before)':>15} {'index (after)':>15}")
+    for query in queries:
+        start = time.perf_counter()
+        scan(df, query)
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = index.search(query)
+        after = time.perf_counter() - start
+        note = " (fuzzy)" if hits.fuzzy else ""
+        print(f"  {query:24} {len(hits):8,} {before * 1000:12.1f} ms {after * 1000:12.2f} ms{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Heap cost of each additional session holding the project's raw mappings.
+
+    python benchmarks/bench_session_memory.py [n_mappings] [n_sessions]
+
+Before: every session got its own copy of the mapping list from
+st.cache_data (a pickle round trip) and kept {id: mapping dict} in
+st.session_state["mapping_lookup"].
+After: one shared mapping_store.MappingStore per project version, held
+by the project's Catalog; a session keeps only the project name it
+looks the catalog up by.
+
+Reports traced heap (tracemalloc) and, on Linux, resident set size.
+"""
+import gc
+import os
+import pickle
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapping_store import build_store  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def _measure(label, make_session, n_sessions):
+    sessions = []
+    gc.collect()
+    base_heap = tracemalloc.get_traced_memory()[0]
+    base_rss = _rss_mb()
+
+    for _ in range(n_sessions):
+        sessions.append(make_session())
+
+    gc.collect()
+    heap = (tracemalloc.get_traced_memory()[0] - base_heap) / 1e6 / n_sessions
+    line = f"  {label:<34} {heap:9.2f} MB heap/session"
+    rss = _rss_mb()
+    if base_rss is not None and rss is not None:
+        line += f"   {(rss - base_rss) / n_sessions:9.2f} MB RSS/session"
+    print(line)
+    return sessions
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    mappings = generate_mappings(n, depth=(2, 4))
+    cached = pickle.dumps(mappings, protocol=pickle.HIGHEST_PROTOCOL)
+    del mappings
+
+    tracemalloc.start()
+    print(f"{n:,} mappings, {n_sessions} sessions")
+
+    def old_session():
+        mappings = pickle.loads(cached)
+        return {"mapping_lookup": {m.get("id"): m for m in mappings}}
+
+    old = _measure("per-session mapping_lookup", old_session, n_sessions)
+    del old
+
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build_store(pickle.loads(cached))
+    gc.collect()
+    shared = (tracemalloc.get_traced_memory()[0] - before) / 1e6
+    print(f"  {'shared MappingStore (once)':<34} {shared:9.2f} MB")
+
+    new = _measure("per-session project name", lambda: {"project": "bench"}, n_sessions)
+    assert len(store) == n and new
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Variable tree construction (pages/3_choose_variable.py, every rerun).
+
+    python benchmarks/bench_tree_build.py [sizes...]
+
+Compares the original groupby + iterrows() implementation of
+tree_utils.build_nodes_and_lookup (copied below) with the vectorized one
+at 10k/100k leaves, and checks both return the same nodes and lookup.
+"""
+import gc
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapping_columns import mappings_to_df  # noqa: E402
+from stub_backend import generate_mappings  # noqa: E402
+from tree_utils import build_nodes_and_lookup  # noqa: E402
+
+
+def legacy_build_nodes_and_lookup(df):
+    # tree_utils.build_nodes_and_lookup before the rewrite
+    df = df.copy()
+
+    # Fill hierarchy columns for grouping
+    for col in ["Organ System", "Group", "Variable"]:
+        if col in df.columns:
+            df[col] = df[col].fillna("Unknown").astype(str)
+
+    # We require row identity to be present and stable
+    if "__row_key__" not in df.columns:
+        raise ValueError(
+            "build_nodes_and_lookup expects '__row_key__' to already exist in df. "
+            "Create it once in data_store.get_master_df() / upsert_overlay_from_upload()."
+        )
+
+    # Ensure row_key is string and unique
+    df["__row_key__"] = df["__row_key__"].astype(str)
+
+    # Keep last occurrence for duplicates (overlay updates, etc.)
+    df = df.drop_duplicates(subset=["__row_key__"], keep="last")
+
+    nodes = []
+    leaf_lookup = {}
+
+    # Sort for stable tree ordering
+    df_sorted = df.sort_values(["Organ System", "Group", "Variable"])
+
+    for os_name, os_df in df_sorted.groupby("Organ System", dropna=False):
+        os_name = str(os_name)
+
+        os_node = {
+            "label": os_name,
+            "value": f"OS:{os_name}",
+            "children": [],
+        }
+
+        for group_name, group_df in os_df.groupby("Group", dropna=False):
+            group_name = str(group_name)
+
+            group_node = {
+                "label": group_name,
+                "value": f"GR:{os_name}/{group_name}",
+                "children": [],
+            }
+
+            for _, row in group_df.iterrows():
+                var = str(row.get("Variable", "")).strip()
+                row_key = str(row["__row_key__"]).strip()
+
+                # human label
+                label_parts = [var] if var else ["(Unnamed variable)"]
+                source = row.get("Source")
+                if source:
+                    label_parts.append(f"({source})")
+                label = " ".join(label_parts)
+
+                # STABLE leaf value (selection-safe)
+                leaf_value = f"ROW:{row_key}"
+
+                leaf = {"label": label, "value": leaf_value}
+                group_node["children"].append(leaf)
+
+                # lookup leaf -> full row dict
+                leaf_lookup[leaf_value] = row.to_dict()
+
+            os_node["children"].append(group_node)
+
+        nodes.append(os_node)
+
+    return nodes, leaf_lookup
+
+
+def _time(fn, arg, repeat: int):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        out = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            out = fn(arg)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best * 1000, out
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"pandas {pd.__version__}")
+
+    for n in sizes:
+        df = mappings_to_df(generate_mappings(n))
+        repeat = 3 if n <= 10_000 else 1
+
+        old_ms, (old_nodes, old_lookup) = _time(legacy_build_nodes_and_lookup, df, repeat)
+        new_ms, (new_nodes, new_lookup) = _time(build_nodes_and_lookup, df, repeat)
+        same = new_nodes == old_nodes and list(new_lookup) == list(old_lookup)
+
+        print(f"\n{n:,} leaves")
+        print(f"  groupby + iterrows   {old_ms:9.1f} ms")
+        print(f"  vectorized           {new_ms:9.1f} ms   ({old_ms / new_ms:.1f}x faster, same output: {same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from mapping_columns import SOURCE_EPIC, SOURCE_PDMS, apply_delta
+from mapping_store import MappingStore
+from search_index import SearchIndex
+
+# source_filter -> required __sources__ bit (Both = no restriction)
+SOURCE_FILTERS = {"Both": 0, "EPIC": SOURCE_EPIC, "PDMS": SOURCE_PDMS}
+
+
+# -------------------------------------------------
+# Catalog (derived data for one project version)
+# -------------------------------------------------
+
+class Catalog:
+    """
+    The master frame and mapping store of one project at one mapping-set
+    version, plus the views derived from them. Shared by every session in the process and
+    never modified after install (apart from the sync bookkeeping in
+    mark_synced): anything that changes the mapping set installs a new
+    Catalog with a higher version.
+
+    Callers must treat `frame` and the views as read-only (pandas
+    copy-on-write makes accidental column assignment on a view safe).
+    """
+
+    def __init__(self, project: str, version: int, frame: pd.DataFrame, store=None, remote_version=None, etag=None):
+        """
+        store: a MappingStore, or a zero-argument callable that builds it
+        on first access (e.g. from an on-disk snapshot).
+
+        remote_version: the backend's mapping-set version this catalog
+        reflects (cursor for delta sync; None = unknown), etag its ETag
+        on /mappings. `version` is the local, per-process counter.
+        """
+        self.project = project
+        self.version = version
+        self.frame = frame
+        self.built_at = time.time()
+        self.remote_version = remote_version
+        self.etag = etag
+        self.synced_at = self.built_at
+
+        self._store = store if store is not None else MappingStore()
+        self._views: dict = {}
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._search = None
+        self._search_lock = threading.Lock()
+
+    @property
+    def store(self) -> MappingStore:
+        if callable(self._store):
+            with self._store_lock:
+                if callable(self._store):
+                    self._store = self._store()
+        return self._store
+
+    def mark_synced(self, remote_version=None, etag=None):
+        """
+        Record a sync that found no changes (sync bookkeeping only; the
+        data stays untouched).
+        """
+        if remote_version is not None:
+            self.remote_version = remote_version
+        if etag is not None:
+            self.etag = etag
+        self.synced_at = time.time()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def rows(self, source_filter: str = "Both") -> np.ndarray | None:
+        """
+        Positions in `frame` that have the given source (None = all).
+        """
+        bit = SOURCE_FILTERS.get(source_filter, 0)
+        if not bit:
+            return None
+        return self._cached(("rows", bit), lambda: source_rows(self.frame, bit))
+
+    def view(self, source_filter: str = "Both") -> pd.DataFrame:
+        """
+        Frame restricted to rows that have the given source, built once
+        per catalog; "Both" is the frame itself.
+        """
+        rows = self.rows(source_filter)
+        if rows is None:
+            return self.frame
+        return self._cached(("view", source_filter), lambda: _take(self.frame, rows))
+
+    def index(self, source_filter: str = "Both") -> "RowIndex":
+        """
+        Hash index over view(source_filter), built once per catalog.
+        """
+        view = self.view(source_filter)  # outside _cached: its lock is not reentrant
+        return self._cached(("index", source_filter), lambda: RowIndex(view))
+
+    def search_index(self) -> SearchIndex:
+        """
+        Full-text index over `frame` (all sources; callers filter the
+        hits), with each row's full classification path from the store.
+        Built once, under its own lock so view/index builds do not wait
+        for it.
+        """
+        if self._search is None:
+            with self._search_lock:
+                if self._search is None:
+                    store = self.store
+                    paths = [
+                        record.path if record is not None else ()
+                        for record in map(store.get, self.frame["__row_key__"].tolist())
+                    ]
+                    self._search = SearchIndex(self.frame, paths)
+        return self._search
+
+    @property
+    def search_ready(self) -> bool:
+        return self._search is not None
+
+    def warm_search(self):
+        """
+        Build the search index on a background thread (no-op once built
+        or while building).
+        """
+        if self._search is None and not self._search_lock.locked():
+            threading.Thread(
+                target=self.search_index, name=f"kim-search-{self.project}", daemon=True,
+            ).start()
+
+    def _cached(self, key, build):
+        value = self._views.get(key)
+        if value is None:
+            with self._lock:
+                value = self._views.get(key)
+                if value is None:
+                    value = self._views[key] = build()
+        return value
+
+
+def source_rows(df: pd.DataFrame, bit: int) -> np.ndarray:
+    return np.flatnonzero(df["__sources__"].to_numpy() & bit)
+
+
+def source_view(df: pd.DataFrame, source_filter: str) -> pd.DataFrame:
+    """
+    Uncached source filter, for frames that are not a catalog (overlays).
+    """
+    bit = SOURCE_FILTERS.get(source_filter, 0)
+    return _take(df, source_rows(df, bit)) if bit else df
+
+
+def _take(df: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+    return df.take(rows).reset_index(drop=True)
+
+
+# -------------------------------------------------
+# Row index (hash lookups over one frame)
+# -------------------------------------------------
+
+SOURCE_COLUMNS = {"EPIC": "EPIC ID", "PDMS": "PDMS ID"}
+
+
+class RowIndex:
+    """
+    O(1) lookups over one master frame (a catalog view or an overlay):
+
+        row_key in index            membership
+        index.position(row_key)     row position or None
+        index.positions(row_keys)   positions of the known keys, in order
+        index.rows(row_keys)        those rows as a frame
+        index.by_source("EPIC", id) positions of rows with that source id
+
+    The __row_key__ map is built up front; the per-source maps on first
+    use. Read-only once built.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self._keys = dict(zip(map(str, frame["__row_key__"].tolist()), range(len(frame))))
+        self._sources: dict = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, row_key):
+        return row_key in self._keys
+
+    def position(self, row_key) -> int | None:
+        return self._keys.get(row_key)
+
+    def positions(self, row_keys) -> np.ndarray:
+        get = self._keys.get
+        found = [p for p in map(get, row_keys) if p is not None]
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def rows(self, row_keys) -> pd.DataFrame:
+        return _take(self.frame, self.positions(row_keys))
+
+    def by_source(self, system: str, source_id: str) -> np.ndarray:
+        column = SOURCE_COLUMNS[system.upper()]
+        index = self._sources.get(column)
+        if index is None:
+            with self._lock:
+                index = self._sources.get(column)
+                if index is None:
+                    index = self._sources[column] = self.frame.groupby(column, sort=False).indices
+        return index.get(source_id, np.empty(0, dtype=np.int64))
+
+
+# -------------------------------------------------
+# Registry (process-wide, latest version per project)
+# -------------------------------------------------
+
+class CatalogRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._catalogs: dict = {}
+        self._versions: dict = {}
+
+        self.hits = 0
+        self.installs = 0
+        self.deltas = 0
+        self.invalidations = 0
+
+    def get(self, project: str) -> Catalog | None:
+        with self._lock:
+            catalog = self._catalogs.get(project)
+            if catalog is not None:
+                self.hits += 1
+            return catalog
+
+    def install(self, project: str, frame: pd.DataFrame, store=None, remote_version=None, etag=None) -> Catalog:
+        """
+        Publish `frame` (and its mapping store) as the project's next version.
+        """
+        with self._lock:
+            version = self._versions.get(project, 0) + 1
+            self._versions[project] = version
+            catalog = self._catalogs[project] = Catalog(project, version, frame, store, remote_version, etag)
+            self.installs += 1
+            return catalog
+
+    def apply(self, project: str, upserts=(), deletes=(), remote_version=None, etag=None, base=None) -> Catalog | None:
+        """
+        Merge confirmed mapping changes into the project's catalog and
+        publish the result as the next version. Other projects are not
+        touched. Returns None when the project is not cached (the next
+        load fetches it anyway).
+
+        remote_version / etag: what the result reflects on the backend
+        (delta sync); local edits leave the ETag unknown. base: only apply if
+        the project's catalog is still this one (returns None otherwise).
+        """
+        with self._apply_lock:
+            with self._lock:
+                current = self._catalogs.get(project)
+            if current is None or (base is not None and current is not base):
+                return None
+
+            upserts = list(upserts)
+            deletes = list(deletes)
+            frame = apply_delta(current.frame, upserts, deletes)
+            if frame is current.frame:
+                if remote_version is not None:
+                    current.mark_synced(remote_version, etag)
+                return current
+            store = current.store.apply(upserts, deletes)
+
+            with self._lock:
+                if self._catalogs.get(project) is not current:
+                    # replaced or invalidated meanwhile: that state wins
+                    return self._catalogs.get(project)
+                version = self._versions[project] = self._versions[project] + 1
+                catalog = self._catalogs[project] = Catalog(
+                    project, version, frame, store,
+                    current.remote_version if remote_version is None else remote_version,
+                    etag,
+                )
+                self.deltas += 1
+                return catalog
+
+    def invalidate(self, project: str | None = None):
+        """
+        Drop the project's catalog (or all); the next get() misses.
+        Versions keep counting up, so stale handles never collide.
+        """
+        with self._lock:
+            if project is None:
+                self._catalogs.clear()
+            else:
+                self._catalogs.pop(project, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "projects": len(self._catalogs),
+                "rows": sum(len(c) for c in self._catalogs.values()),
+                "hits": self.hits,
+                "installs": self.installs,
+                "deltas": self.deltas,
+                "invalidations": self.invalidations,
+            }
+
+
+_registry = CatalogRegistry()
+
+
+def get_catalogs() -> CatalogRegistry:
+    return _registry
+
+
+def catalog_stats() -> dict:
+    return _registry.stats()
@@ -0,0 +1,314 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import stat
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from mapping_store import MappingStore, RecordBuilder
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # snapshots are optional
+    pa = None
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+#
+# KIM_CATALOG_SNAPSHOT_DIR  where catalogs are persisted ("" = off);
+#                           defaults to the user's cache directory
+
+SNAPSHOT_DIR = os.getenv(
+    "KIM_CATALOG_SNAPSHOT_DIR",
+    os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "kim-varmap",
+        "catalog",
+    ),
+)
+
+# bump when the frame / record layout changes; older snapshots are ignored
+SNAPSHOT_FORMAT = 2
+
+logger = logging.getLogger("kim.api.snapshot")
+
+_save_lock = threading.Lock()
+
+_RECORD_SCHEMA = None if pa is None else pa.schema([
+    ("id", pa.string()),
+    ("name", pa.string()),
+    ("unit", pa.string()),
+    ("status", pa.string()),
+    ("path", pa.list_(pa.string())),
+    ("systems", pa.list_(pa.string())),
+    ("variables", pa.list_(pa.string())),
+])
+
+
+def enabled() -> bool:
+    return pa is not None and bool(SNAPSHOT_DIR)
+
+
+# -------------------------------------------------
+# Layout
+# -------------------------------------------------
+#
+# <dir>/<slug>.meta.json          points at the current pair of files
+# <dir>/<slug>-<id>.frame.arrow   master frame (Arrow IPC, uncompressed;
+#                                 read through a memory map on load)
+# <dir>/<slug>-<id>.records.arrow mapping store records (read on demand)
+#
+# Data files are written first and never modified; meta.json is
+# replaced atomically, so a reader always sees a complete snapshot.
+# Only files owned by this user and not writable by group/others are
+# loaded (and the directory must pass the same check).
+
+def _slug(project: str) -> str:
+    digest = hashlib.sha1(project.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', project)[:60]}-{digest}"
+
+
+def _meta_path(project: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{_slug(project)}.meta.json")
+
+
+def _write_table(path: str, table):
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.chmod(path, 0o600)
+
+
+def _open_table(path: str):
+    return ipc.open_file(pa.memory_map(path, "r"))
+
+
+# Arrow columns are typed, the backend's JSON is not (integer ids,
+# numeric units, ...). A text column holding any other value is stored
+# with its values JSON-encoded and listed in meta["json_columns"].
+
+def _is_text(value) -> bool:
+    return value is None or isinstance(value, str)
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value)
+
+
+def _loads(value):
+    return None if value is None else json.loads(value)
+
+
+def _encode_frame(frame: pd.DataFrame) -> tuple[pd.DataFrame, list]:
+    encoded = {}
+    for name in frame.columns:
+        col = frame[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            if not all(isinstance(c, str) for c in col.cat.categories):
+                encoded[name] = col.cat.rename_categories([json.dumps(c) for c in col.cat.categories])
+        elif col.dtype == object and not all(_is_text(v) for v in col.tolist()):
+            encoded[name] = pd.Series([_dumps(v) for v in col.tolist()], index=col.index, dtype=object)
+    return (frame.assign(**encoded) if encoded else frame), list(encoded)
+
+
+def _decode_frame(frame: pd.DataFrame, names) -> pd.DataFrame:
+    for name in names:
+        col = frame[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            frame[name] = col.cat.rename_categories([json.loads(c) for c in col.cat.categories])
+        else:
+            frame[name] = pd.Series([_loads(v) for v in col.tolist()], index=col.index, dtype=object)
+    return frame
+
+
+def _encode_records(columns: dict) -> tuple[dict, list]:
+    encoded = {}
+    for name, values in columns.items():
+        if isinstance(_RECORD_SCHEMA.field(name).type, pa.ListType):
+            if not all(_is_text(v) for row in values for v in row):
+                encoded[name] = [[_dumps(v) for v in row] for row in values]
+        elif not all(_is_text(v) for v in values):
+            encoded[name] = [_dumps(v) for v in values]
+    return {**columns, **encoded}, list(encoded)
+
+
+def _decode_records(table, names) -> list:
+    columns = []
+    for name in _RECORD_SCHEMA.names:
+        values = table.column(name).to_pylist()
+        if name in names:
+            if isinstance(_RECORD_SCHEMA.field(name).type, pa.ListType):
+                values = [[_loads(v) for v in row] for row in values]
+            else:
+                values = [_loads(v) for v in values]
+        columns.append(values)
+    return columns
+
+
+def _trusted(path: str) -> bool:
+    """
+    Owned by the current user and not group/other-writable.
+    """
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return False
+    if hasattr(os, "getuid") and stats.st_uid != os.getuid():
+        return False
+    return not stats.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+# -------------------------------------------------
+# Save / load
+# -------------------------------------------------
+
+class Snapshot:
+    """
+    A catalog read back from disk. `frame` is fully materialized from
+    the frame file; the records file is kept open as a memory map (so it
+    survives a newer save unlinking it) and only read by load_store().
+    """
+
+    def __init__(self, project, frame, records, etag, saved_at, info=None, json_records=()):
+        self.project = project
+        self.frame = frame
+        self.etag = etag
+        self.saved_at = saved_at
+        self.info = info or {}
+        self._records = records
+        self._json_records = json_records
+
+    def load_store(self) -> MappingStore:
+        builder = RecordBuilder()
+        builder.extend_columns(*_decode_records(self._records.read_all(), self._json_records))
+        return builder.build()
+
+
+def save_snapshot(project: str, frame: pd.DataFrame, store: MappingStore, etag: str | None = None, **info) -> bool:
+    """
+    Persist the catalog. Failures are logged and ignored (the snapshot
+    is only an accelerator). `info` (JSON values, e.g. the backend
+    version) comes back as Snapshot.info.
+    """
+    if not enabled():
+        return False
+
+    try:
+        with _save_lock:
+            return _save(project, frame, store, etag, info)
+    except Exception as e:
+        logger.warning("catalog snapshot save failed for %s: %s", project, e)
+        return False
+
+
+def _save(project, frame, store, etag, info) -> bool:
+    os.makedirs(SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+    # raises for a directory owned by someone else
+    os.chmod(SNAPSHOT_DIR, 0o700)
+    stem = f"{_slug(project)}-{uuid.uuid4().hex[:12]}"
+    frame_file = f"{stem}.frame.arrow"
+    records_file = f"{stem}.records.arrow"
+
+    frame, json_frame = _encode_frame(frame)
+    columns, json_records = _encode_records(store.columns())
+    _write_table(
+        os.path.join(SNAPSHOT_DIR, frame_file),
+        pa.Table.from_pandas(frame, preserve_index=False),
+    )
+    _write_table(
+        os.path.join(SNAPSHOT_DIR, records_file),
+        pa.Table.from_pydict(columns, schema=_RECORD_SCHEMA),
+    )
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "project": project,
+        "etag": etag,
+        "saved_at": time.time(),
+        "rows": len(frame),
+        "frame": frame_file,
+        "records": records_file,
+        "json_columns": {"frame": json_frame, "records": json_records},
+        "info": info,
+    }
+    tmp = f"{_meta_path(project)}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.chmod(tmp, 0o600)
+    os.replace(tmp, _meta_path(project))
+
+    # drop older (or half-written) data files of this project; open
+    # memory maps keep working after unlink
+    prefix = f"{_slug(project)}-"
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.startswith(prefix) and name.endswith(".arrow") and name not in (frame_file, records_file):
+            _remove(os.path.join(SNAPSHOT_DIR, name))
+    return True
+
+
+def save_snapshot_async(project: str, frame: pd.DataFrame, store: MappingStore, etag: str | None = None, **info):
+    threading.Thread(
+        target=save_snapshot,
+        args=(project, frame, store, etag),
+        kwargs=info,
+        name=f"kim-snapshot-{project}",
+        daemon=True,
+    ).start()
+
+
+def load_snapshot(project: str) -> Snapshot | None:
+    if not enabled():
+        return None
+
+    if not os.path.exists(_meta_path(project)):
+        return None
+    if not _trusted(SNAPSHOT_DIR) or not _trusted(_meta_path(project)):
+        logger.warning("catalog snapshot for %s ignored: %s not owned by this user or writable by others", project, SNAPSHOT_DIR)
+        return None
+
+    meta = _read_meta(project)
+    if meta is None or meta.get("format") != SNAPSHOT_FORMAT or meta.get("project") != project:
+        return None
+
+    frame_path = os.path.join(SNAPSHOT_DIR, os.path.basename(str(meta.get("frame"))))
+    records_path = os.path.join(SNAPSHOT_DIR, os.path.basename(str(meta.get("records"))))
+    if not _trusted(frame_path) or not _trusted(records_path):
+        logger.warning("catalog snapshot for %s ignored: files not owned by this user or writable by others", project)
+        return None
+
+    json_columns = meta.get("json_columns") or {}
+    try:
+        frame = _open_table(frame_path).read_all().to_pandas()
+        frame = _decode_frame(frame, json_columns.get("frame") or ())
+        records = _open_table(records_path)
+    except Exception as e:
+        logger.warning("catalog snapshot unreadable for %s: %s", project, e)
+        return None
+
+    return Snapshot(
+        project, frame, records, meta.get("etag"), meta.get("saved_at"), meta.get("info"),
+        json_records=json_columns.get("records") or (),
+    )
+
+
+def _read_meta(project: str) -> dict | None:
+    try:
+        with open(_meta_path(project), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+#
+# KIM_CATALOG_SYNC_INTERVAL_S  a catalog older than this is synced with
+#                              the backend in the background (0 = off)
+# KIM_SYNC_MAX_DELTA_RATIO     above this share of the catalog changed,
+#                              a full fetch is cheaper than a delta
+
+SYNC_INTERVAL_S = float(os.getenv("KIM_CATALOG_SYNC_INTERVAL_S", "300"))
+MAX_DELTA_RATIO = float(os.getenv("KIM_SYNC_MAX_DELTA_RATIO", "0.25"))
+
+# why a sync fell back to a full fetch
+NO_CATALOG = "no_catalog"
+NO_CURSOR = "no_cursor"
+NO_HISTORY = "history_unavailable"
+TOO_LARGE = "too_large"
+
+logger = logging.getLogger("kim.api.sync")
+
+
+def delta_limit(n_rows: int) -> int:
+    """
+    Most changes worth merging into a catalog of n_rows.
+    """
+    return max(1, int(n_rows * MAX_DELTA_RATIO))
+
+
+# -------------------------------------------------
+# Stats (what each sync saved)
+# -------------------------------------------------
+
+class SyncStats:
+    """
+    Counts syncs and what they saved against refetching in full: the
+    body size and wall time (download + rebuild) of the project's last
+    full fetch, minus those of the delta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._full: dict = {}  # project -> (bytes, seconds) of the last full fetch
+
+        self.full_fetches = 0
+        self.deltas = 0
+        self.unchanged = 0
+        self.changes = 0
+        self.delta_bytes = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        self.fallbacks: dict = {}
+        self.last: dict = {}
+
+    def remember_cost(self, project: str, nbytes: int | None, seconds: float | None):
+        """
+        Cost of a full fetch of `project` (e.g. restored from a snapshot).
+        """
+        if nbytes is not None and seconds is not None:
+            with self._lock:
+                self._full[project] = (nbytes, seconds)
+
+    def cost(self, project: str) -> tuple | None:
+        with self._lock:
+            return self._full.get(project)
+
+    def full_fetch(self, project: str, nbytes: int | None, seconds: float, reason: str | None = None):
+        with self._lock:
+            self.full_fetches += 1
+            if reason is not None:
+                self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+            if nbytes is not None:
+                self._full[project] = (nbytes, seconds)
+        if reason is not None:
+            logger.info("sync %s: full fetch (%s), %s bytes in %.2fs", project, reason, nbytes, seconds)
+
+    def delta(self, project: str, nbytes: int, seconds: float, n_changes: int) -> dict:
+        with self._lock:
+            full = self._full.get(project)
+            saved = {
+                "changes": n_changes,
+                "bytes": nbytes,
+                "seconds": seconds,
+                "bytes_saved": max(0, full[0] - nbytes) if full else None,
+                "seconds_saved": max(0.0, full[1] - seconds) if full else None,
+            }
+            self.deltas += 1
+            self.changes += n_changes
+            self.delta_bytes += nbytes
+            self.bytes_saved += saved["bytes_saved"] or 0
+            self.seconds_saved += saved["seconds_saved"] or 0.0
+            self.last = saved
+
+        logger.info(
+            "sync %s: %d changes, %d bytes in %.3fs (saved %s bytes, %s s)",
+            project, n_changes, nbytes, seconds, saved["bytes_saved"], saved["seconds_saved"],
+        )
+        return saved
+
+    def not_modified(self, project: str):
+        with self._lock:
+            self.unchanged += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {
+                "full_fetches": self.full_fetches,
+                "deltas": self.deltas,
+                "unchanged": self.unchanged,
+                "changes": self.changes,
+                "delta_bytes": self.delta_bytes,
+                "bytes_saved": self.bytes_saved,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "last_bytes_saved": self.last.get("bytes_saved") or 0,
+                "last_seconds_saved": round(self.last.get("seconds_saved") or 0.0, 3),
+            }
+            for reason, n in self.fallbacks.items():
+                out[f"fallback_{reason}"] = n
+            return out
+
+
+_stats = SyncStats()
+
+
+def get_sync_stats() -> SyncStats:
+    return _stats
+
+
+def sync_stats() -> dict:
+    return _stats.stats()
@@ -1,89 +1,537 @@
+import functools
+import threading
+import time
+
 import pandas as pd
 import streamlit as st
 
-from api_client import fetch_base_mapping
+from api_breaker import CircuitOpenError, breaker_state, is_backend_failure
+from api_cache import credential_scope
+from api_client import fetch_mapping_changes, get_project, iter_mappings, mappings_changed
+from api_metrics import get_metrics
+from catalog import SOURCE_FILTERS, Catalog, RowIndex, catalog_stats, get_catalogs, source_view
+from catalog_snapshot import load_snapshot, save_snapshot_async
+from catalog_sync import (
+    NO_CATALOG,
+    NO_CURSOR,
+    NO_HISTORY,
+    SYNC_INTERVAL_S,
+    TOO_LARGE,
+    delta_limit,
+    get_sync_stats,
+    sync_stats,
+)
+from iam_workflow import get_token
+from mapping_columns import COLUMNS, EXPECTED_COLUMNS, ColumnBuilder, apply_delta, mappings_to_df
+from mapping_store import MappingStore, RecordBuilder
+from mutation_queue import DELETE, MutationQueue
+from search_index import MAX_RESULTS, SearchIndex
+from singleflight import single_flight
+from tree_cache import VariableTree, build_tree, get_tree_cache, tree_cache_stats, tree_fingerprint
 
-EXPECTED_COLUMNS = [
-    "Organ System",
-    "Group",
-    "Variable",
-    "EPIC ID",
-    "PDMS ID",
-    "Unit",
-]
 
+# -------------------------------------------------
+# Streaming ingestion into the shared catalog
+# -------------------------------------------------
 
-@st.cache_data(show_spinner=False)
-def load_project_mappings(project: str) -> list[dict]:
-    return fetch_base_mapping(project) or []
+get_metrics().register_collector("catalog", catalog_stats)
+get_metrics().register_collector("sync", sync_stats)
+get_metrics().register_collector("tree", tree_cache_stats)
 
 
-def backend_mappings_to_df(mappings: list[dict]) -> pd.DataFrame:
-    rows = []
-    mapping_lookup = {}
+def load_catalog(project: str, progress=None) -> Catalog:
+    """
+    The project's shared Catalog. On a miss it comes from the on-disk
+    snapshot when there is one (after an access check, then revalidated
+    in the background), otherwise /projects/{project}/mappings is
+    streamed into a new one and snapshotted. `progress` is forwarded to
+    api_client.iter_mappings.
 
-    for m in mappings:
-        mapping_id = m.get("id")
-        classification = m.get("classification") or {}
-        path = classification.get("path") or []
+    Sessions that miss at the same time share one build (single_flight);
+    only the leader reports progress. A hit is served after an access
+    check (_check_access).
+    """
+    token = get_token()
+    catalog = get_catalogs().get(project)
+    if catalog is not None:
+        _check_access(project, token)
+        _sync_if_due(catalog)
+        return catalog
 
-        organ_system = path[0] if len(path) > 0 else "General"
-        group = path[1] if len(path) > 1 else "General"
+    if not token:
+        raise RuntimeError("Not authenticated (no access_token in session_state)")
 
-        epic_id = ""
-        pdms_id = ""
+    catalog = single_flight(
+        ("catalog", project),
+        lambda: _cold_load(project, token, progress),
+        scope=credential_scope(token),
+        verify=lambda: get_project(project, token=token),
+    )
+    _grant_access(project, token)
+    return catalog
 
-        for src in m.get("source") or []:
-            system = (src.get("system") or "").upper()
-            variable = src.get("variable") or ""
 
-            if system == "EPIC":
-                epic_id = variable
-            elif system == "PDMS":
-                pdms_id = variable
+# -------------------------------------------------
+# Access to shared catalogs
+# -------------------------------------------------
 
-        rows.append({
-            "Organ System": organ_system,
-            "Group": group,
-            "Variable": m.get("name", ""),
-            "EPIC ID": epic_id,
-            "PDMS ID": pdms_id,
-            "Unit": m.get("unit", ""),
-            "__row_key__": mapping_id,
-        })
+# (credential scope, project) -> epoch seconds of the last successful check
+_access_checked: dict = {}
+_access_lock = threading.Lock()
 
-        mapping_lookup[mapping_id] = m
+ACCESS_CHECK_TTL_S = 300
 
-    df = pd.DataFrame(rows)
 
-    for col in EXPECTED_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
+def _check_access(project: str, token: str | None):
+    """
+    A shared catalog goes to a session only after get_project() succeeded
+    with its token; a success is remembered per credential scope for
+    ACCESS_CHECK_TTL_S. While the backend is unavailable, an earlier
+    success still counts.
+    """
+    if not token:
+        raise RuntimeError("Not authenticated (no access_token in session_state)")
 
-    st.session_state["mapping_lookup"] = mapping_lookup
+    key = (credential_scope(token), project)
+    with _access_lock:
+        checked = _access_checked.get(key)
+    if checked is not None and time.time() - checked < ACCESS_CHECK_TTL_S:
+        return
+
+    try:
+        get_project(project, token=token)
+    except Exception as e:
+        if checked is not None and is_backend_failure(e):
+            return
+        with _access_lock:
+            _access_checked.pop(key, None)
+        raise
+    _grant_access(project, token)
+
+
+def _grant_access(project: str, token: str):
+    with _access_lock:
+        _access_checked[(credential_scope(token), project)] = time.time()
+
+
+def _had_access(project: str, token: str | None) -> bool:
+    if not token:
+        return False
+    with _access_lock:
+        return (credential_scope(token), project) in _access_checked
+
+
+def _cold_load(project: str, token: str, progress=None) -> Catalog:
+    snapshot = load_snapshot(project)
+    if snapshot is not None:
+        # local data, but only for a user the backend lets read it
+        get_project(project, token=token)
+        info = snapshot.info
+        catalog = get_catalogs().install(
+            project, snapshot.frame, snapshot.load_store, info.get("remote_version"), snapshot.etag,
+        )
+        get_sync_stats().remember_cost(project, info.get("full_bytes"), info.get("full_s"))
+        _revalidate_in_background(project, token)
+        return catalog
+
+    return _fetch(project, token, progress)
+
+
+def _fetch(project: str, token: str, progress=None, reason: str | None = None) -> Catalog:
+    """
+    Full fetch. reason: why a sync fell back to it (None = first load).
+    """
+    start = time.perf_counter()
+    meta = {}
+    frame, store = _ingest(project, token, progress, meta)
+    catalog = get_catalogs().install(project, frame, store, meta.get("version"), meta.get("etag"))
+    get_sync_stats().full_fetch(project, meta.get("bytes"), time.perf_counter() - start, reason)
+    _save_snapshot(catalog)
+    return catalog
+
+
+def _save_snapshot(catalog: Catalog):
+    full_bytes, full_s = get_sync_stats().cost(catalog.project) or (None, None)
+    save_snapshot_async(
+        catalog.project, catalog.frame, catalog.store, catalog.etag,
+        remote_version=catalog.remote_version, full_bytes=full_bytes, full_s=full_s,
+    )
+
+
+def _ingest(project: str, token: str, progress=None, meta=None) -> tuple[pd.DataFrame, MappingStore]:
+    """
+    One streamed pass into both the master frame and the mapping store.
+    """
+    cols = ColumnBuilder()
+    records = RecordBuilder()
+    cols.extend(records.feed(iter_mappings(project, progress=progress, token=token, meta=meta)))
+    return cols.to_df(), records.build()
+
+
+# -------------------------------------------------
+# Delta sync with the backend
+# -------------------------------------------------
+
+def sync_catalog(project: str, token: str | None = None) -> Catalog:
+    """
+    Bring the project's catalog up to date with the backend by merging
+    only the mappings changed since its remote_version
+    (/mappings/changes). Falls back to an ETag check and then a full
+    fetch when there is no cursor, the backend keeps no history back
+    that far, or more than delta_limit() mappings changed. Each sync's
+    savings are recorded in catalog_sync's stats.
+    """
+    token = token or get_token()
+    catalog = get_catalogs().get(project)
+    if catalog is None:
+        return _fetch(project, token, reason=NO_CATALOG)
+
+    stats = get_sync_stats()
+    reason = NO_CURSOR
+    if catalog.remote_version is not None:
+        start = time.perf_counter()
+        meta = {}
+        limit = delta_limit(len(catalog))
+        changes = fetch_mapping_changes(project, catalog.remote_version, limit, token=token, meta=meta)
+
+        upserts = (changes or {}).get("upserts") or []
+        deletes = (changes or {}).get("deletes") or []
+        if changes is None:
+            reason = NO_HISTORY
+        elif changes.get("truncated") or len(upserts) + len(deletes) > limit:
+            reason = TOO_LARGE
+        else:
+            synced = get_catalogs().apply(
+                project, upserts, deletes, changes.get("version"), changes.get("etag"), base=catalog,
+            )
+            if synced is None:
+                # replaced meanwhile (another sync, a refetch): that one wins
+                return get_catalogs().get(project) or _fetch(project, token, reason=NO_CATALOG)
+
+            stats.delta(project, meta.get("bytes", 0), time.perf_counter() - start, len(upserts) + len(deletes))
+            if synced is not catalog:
+                _save_snapshot(synced)
+            return synced
+
+    if reason == NO_CURSOR and catalog.etag and not mappings_changed(project, catalog.etag, token=token):
+        catalog.mark_synced()
+        stats.not_modified(project)
+        return catalog
+
+    return _fetch(project, token, reason=reason)
+
+
+def _sync_if_due(catalog: Catalog):
+    if SYNC_INTERVAL_S and time.time() - catalog.synced_at > SYNC_INTERVAL_S:
+        token = get_token()
+        if token:
+            _revalidate_in_background(catalog.project, token)
+
+
+# -------------------------------------------------
+# Stale-while-revalidate (backend down / circuit open)
+# -------------------------------------------------
+
+# project -> (catalog, as_of epoch seconds); process-wide, last good load
+_last_good: dict = {}
+# project -> error label, while its background revalidation keeps failing
+_sync_failing: dict = {}
+_revalidating: set = set()
+_stale_lock = threading.Lock()
+
+REVALIDATE_GIVE_UP_S = 600
+
+
+def _remember_good(catalog: Catalog):
+    with _stale_lock:
+        _last_good[catalog.project] = (catalog, time.time())
+
+
+def _synced(project: str):
+    with _stale_lock:
+        _sync_failing.pop(project, None)
+
+
+def _error_label(e: Exception) -> str:
+    return str(e) if isinstance(e, CircuitOpenError) else type(e).__name__
+
+
+def _stale_flag(catalog: Catalog) -> dict | None:
+    """
+    The catalog_stale flag for a registry hit: set while the project's
+    revalidation is failing or the breaker is open.
+    """
+    with _stale_lock:
+        error = _sync_failing.get(catalog.project)
+    if error is None and breaker_state()["state"] == "open":
+        error = "CircuitOpenError"
+    if error is None:
+        return None
+    return {"project": catalog.project, "as_of": catalog.synced_at, "error": error}
+
+
+def _revalidate_in_background(project: str, token: str):
+    """
+    sync_catalog() off the script thread, retried until the backend
+    answers; the result is there for the next rerun.
+    """
+    with _stale_lock:
+        if project in _revalidating:
+            return
+        _revalidating.add(project)
+
+    def _run():
+        deadline = time.monotonic() + REVALIDATE_GIVE_UP_S
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    catalog = sync_catalog(project, token)
+                except Exception as e:
+                    if not is_backend_failure(e):
+                        return
+                    with _stale_lock:
+                        _sync_failing[project] = _error_label(e)
+                    wait = breaker_state().get("retry_in_s") or 5.0
+                    time.sleep(max(1.0, wait))
+                    continue
+
+                _remember_good(catalog)
+                _synced(project)
+                return
+        finally:
+            with _stale_lock:
+                _revalidating.discard(project)
+
+    threading.Thread(target=_run, name=f"kim-revalidate-{project}", daemon=True).start()
 
-    return df
+
+def _load_with_progress(project: str) -> Catalog:
+    """
+    Loads the project's catalog. If the backend is unavailable and this
+    process has loaded the project before, the last good catalog is served
+    instead, flagged in st.session_state["catalog_stale"], while a
+    background thread revalidates it. A catalog already in the registry
+    stays flagged until a sync succeeds.
+    """
+    catalog = get_catalogs().get(project)
+    if catalog is not None:
+        _check_access(project, get_token())
+        _sync_if_due(catalog)
+        stale = _stale_flag(catalog)
+        if stale is None:
+            st.session_state.pop("catalog_stale", None)
+        else:
+            st.session_state["catalog_stale"] = stale
+        return catalog
+
+    bar = st.empty()
+
+    def _progress(n, read, total):
+        text = f"Loading variables… {n:,} ({read / 1e6:.1f} MB)"
+        bar.progress(min(1.0, read / total) if total else 0.0, text=text)
+
+    try:
+        catalog = load_catalog(project, progress=_progress)
+    except Exception as e:
+        with _stale_lock:
+            snapshot = _last_good.get(project)
+        if snapshot is None or not is_backend_failure(e) or not _had_access(project, get_token()):
+            raise
+
+        st.session_state["catalog_stale"] = {
+            "project": project,
+            "as_of": snapshot[1],
+            "error": _error_label(e),
+        }
+        _revalidate_in_background(project, get_token())
+        return snapshot[0]
+    finally:
+        bar.empty()
+
+    _remember_good(catalog)
+    _synced(project)
+    st.session_state.pop("catalog_stale", None)
+    return catalog
+
+
+# -------------------------------------------------
+# Write-behind edits (optimistic overlay)
+# -------------------------------------------------
+
+def apply_mapping_changes(project: str, upserts=(), deletes=()) -> Catalog | None:
+    """
+    Merge mappings the backend has confirmed (created/updated dicts and
+    deleted ids) into the project's shared catalog as a new version,
+    instead of dropping it and refetching everything.
+    """
+    catalog = get_catalogs().apply(project, upserts, deletes)
+    if catalog is not None:
+        _remember_good(catalog)
+    return catalog
+
+
+def _on_flushed(project: str, report: list[dict], token: str | None = None):
+    # runs on the flush thread
+    resync = any(
+        r["status"] in ("conflict", "unknown")
+        # created, but the response did not say under which id
+        or (r["status"] == "ok" and r["kind"] != DELETE and r["mapping"] is None)
+        for r in report
+    )
+    if resync:
+        # the backend holds a version we have not seen (or may have
+        # applied an edit we got no answer for): sync with it (this also
+        # picks up the edits that did go through)
+        if token:
+            _revalidate_in_background(project, token)
+        else:
+            get_catalogs().invalidate(project)
+        return
+
+    ok = [r for r in report if r["status"] == "ok"]
+    apply_mapping_changes(
+        project,
+        upserts=[r["mapping"] for r in ok if r["kind"] != DELETE],
+        deletes=[r["mapping_id"] for r in ok if r["kind"] == DELETE],
+    )
+
+
+def get_mutation_queue(project: str | None = None) -> MutationQueue:
+    """
+    The session's pending-edit queue for `project` (default: current).
+    """
+    project = project or st.session_state.get("project")
+    token = get_token()
+
+    queue = st.session_state.get("mutation_queue")
+    if queue is None or queue.project != project or queue.token != token:
+        if queue is not None:
+            queue.cancel()
+            if len(queue):
+                queue.flush()
+        queue = MutationQueue(project, token, on_flushed=functools.partial(_on_flushed, token=token))
+        st.session_state["mutation_queue"] = queue
+
+    return queue
+
+
+def _apply_pending(df: pd.DataFrame, edits) -> pd.DataFrame:
+    return apply_delta(
+        df,
+        upserts=[{**e.payload, "id": e.mapping_id} for e in edits if e.kind != DELETE],
+        deletes=[e.mapping_id for e in edits if e.kind == DELETE],
+    )
+
+
+def _session_view(project: str):
+    """
+    (catalog, source_filter, pending edits or None) for this session.
+    """
+    catalog = _load_with_progress(project)
+    catalog.warm_search()
+    source_filter = st.session_state.get("source_filter", "Both")
+
+    queue = st.session_state.get("mutation_queue")
+    edits = queue.pending() if queue is not None and queue.project == project else None
+    return catalog, source_filter, edits
 
 
 def get_master_df() -> pd.DataFrame:
+    """
+    The current project's master frame, filtered by source. Shared and
+    read-only unless this session has pending edits to overlay.
+    """
     project = st.session_state.get("project")
     if not project:
         return pd.DataFrame(columns=EXPECTED_COLUMNS)
 
-    mappings = load_project_mappings(project)
+    return _master_view(*_session_view(project))
 
-    if not mappings:
-        df = pd.DataFrame(columns=EXPECTED_COLUMNS + ["__row_key__"])
-        return df
 
+def _master_view(catalog: Catalog, source_filter: str, edits) -> pd.DataFrame:
+    if not edits:
+        df = catalog.view(source_filter)
+    else:
+        df = source_view(_apply_pending(catalog.frame, edits), source_filter)
 
-    df = backend_mappings_to_df(mappings)
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    return df
 
-    source_filter = st.session_state.get("source_filter", "Both")
 
-    if source_filter == "EPIC":
-        df = df[df["EPIC ID"].astype(str).str.strip() != ""]
-    elif source_filter == "PDMS":
-        df = df[df["PDMS ID"].astype(str).str.strip() != ""]
+def get_master_index() -> RowIndex:
+    """
+    Lookup API over exactly the rows get_master_df() returns (row key ->
+    position, EPIC/PDMS id -> positions). Shared per catalog version and
+    source filter; rebuilt per call only while edits are pending.
+    """
+    project = st.session_state.get("project")
+    if not project:
+        return RowIndex(pd.DataFrame(columns=COLUMNS))
+
+    catalog, source_filter, edits = _session_view(project)
+    if not edits:
+        return catalog.index(source_filter)
+    return RowIndex(_master_view(catalog, source_filter, edits))
+
+
+def get_variable_tree() -> VariableTree:
+    """
+    Tree nodes, expand-all values and leaf lookup for exactly the rows
+    get_master_df() returns, from the process-wide tree cache: reruns
+    (and other sessions) showing the same catalog version, source filter
+    and pending edits reuse one build.
+    """
+    project = st.session_state.get("project")
+    if not project:
+        return build_tree(None, pd.DataFrame(columns=COLUMNS))
+
+    catalog, source_filter, edits = _session_view(project)
+    return get_tree_cache().get(
+        tree_fingerprint(project, catalog.version, source_filter, edits),
+        lambda: _master_view(catalog, source_filter, edits),
+    )
+
+
+def search_variables(query: str, limit: int = MAX_RESULTS) -> dict:
+    """
+    Leaf values ("ROW:<row_key>") of the get_master_df() rows matching
+    `query` (see search_index.SearchIndex), at most `limit` of them:
+
+        {"values": [...], "total": n, "fuzzy": bool}
+
+    Uses the catalog's shared index; pending edits are searched in a
+    small index of their own.
+    """
+    project = st.session_state.get("project")
+    if not project:
+        return {"values": [], "total": 0, "fuzzy": False}
+
+    catalog, source_filter, edits = _session_view(project)
+    keys, fuzzy = _search_frame(catalog.frame, catalog.search_index(), query, source_filter)
+
+    if edits:
+        touched = {e.mapping_id for e in edits}
+        keys = [k for k in keys if k not in touched]
+        upserts = [{**e.payload, "id": e.mapping_id} for e in edits if e.kind != DELETE]
+        if upserts:
+            frame = mappings_to_df(upserts)
+            paths = [tuple((m.get("classification") or {}).get("path") or ()) for m in upserts]
+            more, more_fuzzy = _search_frame(frame, SearchIndex(frame, paths), query, source_filter)
+            keys.extend(more)
+            fuzzy = fuzzy or more_fuzzy
+
+    return {
+        "values": ["ROW:" + str(k).strip() for k in keys[:limit]],
+        "total": len(keys),
+        "fuzzy": fuzzy,
+    }
+
 
-    return df.reset_index(drop=True)
+def _search_frame(frame: pd.DataFrame, index: SearchIndex, query: str, source_filter: str) -> tuple[list, bool]:
+    hits = index.search(query)
+    positions = hits.positions
+    bit = SOURCE_FILTERS.get(source_filter, 0)
+    if bit and len(positions):
+        positions = positions[(frame["__sources__"].to_numpy()[positions] & bit) != 0]
+    return frame["__row_key__"].to_numpy(object)[positions].tolist(), hits.fuzzy
@@ -1,9 +1,12 @@
+import json
 import os
 from datetime import datetime
 
 import streamlit as st
 import requests
 
+from api_client import metrics_prometheus, metrics_snapshot
+
 
 # -------------------------------------------------
 # Constants / keys
@@ -128,6 +131,49 @@ def render_auth_debug():
         st.json(st.session_state.get(AUTH_LOG_KEY, []))
 
 
+def render_api_debug():
+    """
+    Optional developer-only API metrics panel (latency percentiles,
+    payload sizes, statuses, retries per endpoint + transport stats).
+    Call explicitly from a page or sidebar.
+    """
+    with st.expander("📈 API Metrics (developers)", expanded=False):
+        snapshot = metrics_snapshot()
+        endpoints = snapshot.pop("endpoints")
+
+        if endpoints:
+            st.dataframe(
+                [
+                    {
+                        **e,
+                        "statuses": ", ".join(f"{k}×{v}" for k, v in sorted(e["statuses"].items())),
+                    }
+                    for e in endpoints
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.caption("No API calls recorded yet.")
+
+        st.write("Transport / cache:")
+        st.json(snapshot)
+
+        left, right = st.columns(2)
+        left.download_button(
+            "Prometheus text",
+            metrics_prometheus(),
+            file_name="kim_api_metrics.prom",
+            mime="text/plain",
+        )
+        right.download_button(
+            "JSON",
+            json.dumps({"endpoints": endpoints, **snapshot}, default=str, indent=2),
+            file_name="kim_api_metrics.json",
+            mime="application/json",
+        )
+
+
 def call_me():
     """
     Debug helper: call backend /me endpoint.
@@ -161,5 +207,6 @@ __all__ = [
     "handle_callback",
     "login_button",
     "render_auth_debug",
+    "render_api_debug",
     "call_me",
 ]
@@ -0,0 +1,108 @@
+import codecs
+import json
+
+
+# -------------------------------------------------
+# Incremental parser for a top-level JSON array
+# -------------------------------------------------
+
+_WS = " \t\n\r"
+
+# characters that can continue a JSON number ("2" -> "2.5e-3")
+_NUMBER_TAIL = frozenset("0123456789+-.eE")
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for `[ {...}, {...}, ... ]` fed in byte chunks.
+
+    Only the not-yet-parsed tail of the input is buffered, so memory stays
+    bounded by one chunk plus the largest single element, regardless of
+    how long the array is.
+
+        parser = JsonArrayStream()
+        for chunk in response.iter_content(65536):
+            for item in parser.feed(chunk):
+                ...
+        parser.close()
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._started = False
+        self._done = False
+        self._expect_comma = False
+
+    def feed(self, chunk: bytes, final: bool = False):
+        self._buf += self._text.decode(chunk, final=final)
+        buf = self._buf
+        pos = 0
+        n = len(buf)
+
+        try:
+            while pos < n and not self._done:
+                while pos < n and buf[pos] in _WS:
+                    pos += 1
+                if pos >= n:
+                    break
+
+                ch = buf[pos]
+
+                if not self._started:
+                    if ch != "[":
+                        raise ValueError(f"Expected a JSON array, got {ch!r}")
+                    self._started = True
+                    pos += 1
+                    continue
+
+                if ch == "]":
+                    self._done = True
+                    pos += 1
+                    break
+
+                if self._expect_comma:
+                    if ch != ",":
+                        raise ValueError(f"Expected ',' or ']' at offset {pos}, got {ch!r}")
+                    self._expect_comma = False
+                    pos += 1
+                    continue
+
+                try:
+                    item, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # element continues in the next chunk
+
+                # a bare scalar at the buffer edge may still be growing:
+                # "2" or "2." can be the start of "2.5" (the decoder stops
+                # at the "."), so wait unless a delimiter follows
+                if not final and not isinstance(item, (dict, list, str)):
+                    if all(c in _NUMBER_TAIL for c in buf[end:]):
+                        break
+
+                pos = end
+                self._expect_comma = True
+                yield item
+        finally:
+            self._buf = buf[pos:]
+
+    def close(self):
+        """
+        Flush the decoder and validate that the array was complete.
+        Yields any element that was only terminated by end of input.
+        """
+        yield from self.feed(b"", final=True)
+        if not self._done:
+            raise ValueError("Truncated JSON array")
+        if self._buf.strip():
+            raise ValueError("Trailing data after JSON array")
+
+
+def iter_json_array(chunks):
+    parser = JsonArrayStream()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,214 @@
+from array import array
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+EXPECTED_COLUMNS = [
+    "Organ System",
+    "Group",
+    "Variable",
+    "EPIC ID",
+    "PDMS ID",
+    "Unit",
+]
+
+COLUMNS = EXPECTED_COLUMNS + ["__row_key__", "__sources__", "__subpath__"]
+
+# low-cardinality columns, stored as pandas categoricals
+CATEGORICAL_COLUMNS = ("Organ System", "Group", "Unit", "__subpath__")
+
+# __subpath__: the classification path below Group (path[2:]), joined
+SUBPATH_SEP = "\x1f"
+
+# __sources__ bits: which source ids a mapping has (non-blank)
+SOURCE_EPIC = 1
+SOURCE_PDMS = 2
+SOURCE_BOTH = SOURCE_EPIC | SOURCE_PDMS
+
+
+# -------------------------------------------------
+# Columnar builder
+# -------------------------------------------------
+
+class ColumnBuilder:
+    """
+    Converts backend mapping dicts straight into typed column arrays in
+    one pass: Organ System / Group / Unit are dictionary-encoded into
+    int32 codes as they arrive (no per-row dict, no second factorize
+    pass), the high-cardinality columns go into plain lists, and the
+    per-row __sources__ bitmask is set so source filtering never has to
+    touch the id strings again. Path levels below Group go into
+    __subpath__ (joined with SUBPATH_SEP, "" for two-level paths).
+    A null Organ System / Group becomes "Unknown" (categories cannot be
+    null; the tree showed it under that label before).
+
+    Feed it a list or a stream (extend / add), then call to_df().
+    """
+
+    def __init__(self):
+        self.organ_system = array("i")
+        self.group = array("i")
+        self.unit = array("i")
+        self.subpath = array("i")
+        self.variable = []
+        self.epic_id = []
+        self.pdms_id = []
+        self.row_key = []
+        self.sources = array("B")
+
+        # value -> code, per categorical column
+        self._organ_codes: dict = {}
+        self._group_codes: dict = {}
+        self._unit_codes: dict = {}
+        self._subpath_codes: dict = {"": 0}
+
+    def __len__(self):
+        return len(self.row_key)
+
+    def add(self, m: dict):
+        self.extend((m,))
+
+    def extend(self, mappings):
+        organ_codes = self._organ_codes
+        group_codes = self._group_codes
+        unit_codes = self._unit_codes
+        subpath_codes = self._subpath_codes
+
+        organ_append = self.organ_system.append
+        group_append = self.group.append
+        unit_append = self.unit.append
+        subpath_append = self.subpath.append
+        variable_append = self.variable.append
+        epic_append = self.epic_id.append
+        pdms_append = self.pdms_id.append
+        key_append = self.row_key.append
+        sources_append = self.sources.append
+
+        for m in mappings:
+            classification = m.get("classification") or {}
+            path = classification.get("path") or ()
+            n = len(path)
+
+            organ = path[0] if n > 0 else "General"
+            if organ is None:
+                organ = "Unknown"
+            code = organ_codes.get(organ)
+            if code is None:
+                code = organ_codes[organ] = len(organ_codes)
+            organ_append(code)
+
+            group = path[1] if n > 1 else "General"
+            if group is None:
+                group = "Unknown"
+            code = group_codes.get(group)
+            if code is None:
+                code = group_codes[group] = len(group_codes)
+            group_append(code)
+
+            if n > 2:
+                subpath = SUBPATH_SEP.join(map(str, path[2:]))
+                code = subpath_codes.get(subpath)
+                if code is None:
+                    code = subpath_codes[subpath] = len(subpath_codes)
+                subpath_append(code)
+            else:
+                subpath_append(0)
+
+            unit = m.get("unit", "")
+            if unit is None:
+                unit_append(-1)
+            else:
+                code = unit_codes.get(unit)
+                if code is None:
+                    code = unit_codes[unit] = len(unit_codes)
+                unit_append(code)
+
+            epic = ""
+            pdms = ""
+            for src in m.get("source") or ():
+                system = src.get("system") or ""
+                if system != "EPIC" and system != "PDMS":
+                    system = system.upper()
+                if system == "EPIC":
+                    epic = src.get("variable") or ""
+                elif system == "PDMS":
+                    pdms = src.get("variable") or ""
+            epic_append(epic)
+            pdms_append(pdms)
+            sources_append(
+                (SOURCE_EPIC if epic and str(epic).strip() else 0)
+                | (SOURCE_PDMS if pdms and str(pdms).strip() else 0)
+            )
+
+            variable_append(m.get("name", ""))
+            key_append(m.get("id"))
+
+    def to_df(self) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                "Organ System": _categorical(self.organ_system, self._organ_codes),
+                "Group": _categorical(self.group, self._group_codes),
+                "Variable": self.variable,
+                "EPIC ID": self.epic_id,
+                "PDMS ID": self.pdms_id,
+                "Unit": _categorical(self.unit, self._unit_codes),
+                "__row_key__": self.row_key,
+                "__sources__": pd.array(self.sources, dtype="uint8"),
+                "__subpath__": _categorical(self.subpath, self._subpath_codes),
+            },
+            columns=COLUMNS,
+        )
+        if not len(df):
+            # empty lists would otherwise come out as float64
+            df = df.astype({c: object for c in COLUMNS if c != "__sources__" and c not in CATEGORICAL_COLUMNS})
+        return df
+
+
+def _categorical(codes: array, categories: dict) -> pd.Categorical:
+    # dict preserves insertion order == code order
+    return pd.Categorical.from_codes(codes, categories=list(categories))
+
+
+def mappings_to_df(mappings) -> pd.DataFrame:
+    builder = ColumnBuilder()
+    builder.extend(mappings)
+    return builder.to_df()
+
+
+# -------------------------------------------------
+# Helpers
+# -------------------------------------------------
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat that keeps the categorical columns categorical (plain
+    concat falls back to object dtype when the categories differ).
+    """
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return mappings_to_df(())
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    out = pd.concat(frames, ignore_index=True)
+    for col in CATEGORICAL_COLUMNS:
+        parts = [f[col] for f in frames if col in f.columns]
+        if len(parts) == len(frames) and all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            out[col] = union_categoricals(parts, ignore_order=True)
+    return out
+
+
+def apply_delta(df: pd.DataFrame, upserts=(), deletes=()) -> pd.DataFrame:
+    """
+    New frame with `upserts` (mapping dicts, matched on id) replacing or
+    appended to the rows of `df` and the `deletes` ids removed.
+    """
+    upserts = list(upserts)
+    touched = {m.get("id") for m in upserts}
+    touched.update(deletes)
+    if not touched:
+        return df
+
+    kept = df[~df["__row_key__"].isin(touched)]
+    return concat_frames([kept, mappings_to_df(upserts)])
@@ -0,0 +1,182 @@
+# -------------------------------------------------
+# Records
+# -------------------------------------------------
+
+class MappingRecord:
+    """
+    One backend mapping; never modified once built. Repeated strings
+    (units, status, source systems, path segments) are interned and
+    paths are shared tuples, so a record costs a few pointers beyond its
+    own id, name and source ids.
+    """
+
+    __slots__ = ("id", "name", "unit", "status", "path", "sources")
+
+    def __init__(self, id, name, unit, status, path, sources):
+        self.id = id
+        self.name = name
+        self.unit = unit
+        self.status = status
+        self.path = path
+        self.sources = sources
+
+    def __repr__(self):
+        return f"MappingRecord({self.id!r}, {self.name!r})"
+
+    def source(self, system: str) -> str:
+        for s, variable in self.sources:
+            if s == system:
+                return variable
+        return ""
+
+    def to_dict(self) -> dict:
+        """
+        The mapping in backend shape (fresh dict, safe to modify).
+        """
+        out = {
+            "id": self.id,
+            "name": self.name,
+            "unit": self.unit,
+            "classification": {"path": list(self.path)},
+            "source": [{"system": s, "variable": v} for s, v in self.sources],
+        }
+        if self.status is not None:
+            out["status"] = self.status
+        return out
+
+
+class RecordBuilder:
+    """
+    Turns mapping dicts into MappingRecords, interning as it goes.
+    """
+
+    def __init__(self):
+        self.records: list = []
+        self._strings: dict = {}
+        self._paths: dict = {}
+        self._systems: dict = {}
+
+    def _intern(self, value):
+        if not isinstance(value, str):
+            return value
+        return self._strings.setdefault(value, value)
+
+    def _path(self, path) -> tuple:
+        key = tuple(path)
+        out = self._paths.get(key)
+        if out is None:
+            out = self._paths[key] = tuple([self._intern(p) for p in key])
+        return out
+
+    def _system(self, system) -> str:
+        out = self._systems.get(system)
+        if out is None:
+            out = self._systems[system] = self._intern((system or "").upper())
+        return out
+
+    def record(self, m: dict) -> MappingRecord:
+        classification = m.get("classification") or {}
+        system = self._system
+
+        return MappingRecord(
+            m.get("id"),
+            m.get("name", ""),
+            self._intern(m.get("unit", "")),
+            self._intern(m.get("status")),
+            self._path(classification.get("path") or ()),
+            tuple([(system(s.get("system")), s.get("variable") or "") for s in m.get("source") or ()]),
+        )
+
+    def feed(self, mappings):
+        """
+        Record every mapping while passing it through (so one streamed
+        response can feed this and a ColumnBuilder).
+        """
+        append = self.records.append
+        record = self.record
+        for m in mappings:
+            append(record(m))
+            yield m
+
+    def extend_columns(self, ids, names, units, statuses, paths, systems, variables):
+        """
+        Add records from parallel column lists (see MappingStore.columns()).
+        """
+        intern = self._intern
+        path = self._path
+        system = self._system
+        self.records.extend(
+            MappingRecord(i, n, intern(u), intern(st), path(p), tuple(zip(map(system, ss), vs)))
+            for i, n, u, st, p, ss, vs in zip(ids, names, units, statuses, paths, systems, variables)
+        )
+
+    def build(self) -> "MappingStore":
+        return MappingStore(self.records)
+
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+
+class MappingStore:
+    """
+    Immutable id -> MappingRecord store for one project version, held by
+    its shared Catalog (search paths, snapshots); sessions keep no copy.
+    Changes go through apply(), which returns a new store and shares all
+    untouched records with this one.
+    """
+
+    def __init__(self, records=()):
+        self._records = tuple(records)
+        self._index = {r.id: i for i, r in enumerate(self._records)}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __contains__(self, mapping_id):
+        return mapping_id in self._index
+
+    def get(self, mapping_id) -> MappingRecord | None:
+        i = self._index.get(mapping_id)
+        return None if i is None else self._records[i]
+
+    def columns(self) -> dict:
+        """
+        Column-oriented copy of the records (for on-disk snapshots).
+        """
+        records = self._records
+        return {
+            "id": [r.id for r in records],
+            "name": [r.name for r in records],
+            "unit": [r.unit for r in records],
+            "status": [r.status for r in records],
+            "path": [list(r.path) for r in records],
+            "systems": [[s for s, _ in r.sources] for r in records],
+            "variables": [[v for _, v in r.sources] for r in records],
+        }
+
+    def apply(self, upserts=(), deletes=()) -> "MappingStore":
+        builder = RecordBuilder()
+        replaced = {}
+        for m in upserts:
+            record = builder.record(m)
+            replaced[record.id] = record
+        removed = set(deletes)
+
+        records = [
+            replaced.pop(r.id, r)
+            for r in self._records
+            if r.id not in removed
+        ]
+        records.extend(replaced.values())
+        return MappingStore(records)
+
+
+def build_store(mappings) -> MappingStore:
+    builder = RecordBuilder()
+    for _ in builder.feed(mappings):
+        pass
+    return builder.build()
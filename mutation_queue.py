@@ -0,0 +1,304 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from api_async import CREATE, DELETE, NOT_PROCESSED_STATUSES, UPDATE, MappingOp, run_mapping_ops
+from api_breaker import breaker_state
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+FLUSH_INTERVAL = float(os.getenv("KIM_MUTATION_FLUSH_INTERVAL", "5"))
+MAX_BATCH = int(os.getenv("KIM_MUTATION_MAX_BATCH", "500"))
+MAX_ATTEMPTS = int(os.getenv("KIM_MUTATION_MAX_ATTEMPTS", "3"))
+
+# While the backend is unavailable the retry interval doubles up to this
+MAX_BACKOFF = float(os.getenv("KIM_MUTATION_MAX_BACKOFF", "60"))
+
+CONFLICT_STATUSES = frozenset({409, 412})
+TMP_PREFIX = "tmp-"
+
+
+# -------------------------------------------------
+# Pending edits
+# -------------------------------------------------
+
+class Edit:
+    __slots__ = ("kind", "mapping_id", "payload", "queued_at", "attempts")
+
+    def __init__(self, kind, mapping_id, payload=None):
+        self.kind = kind
+        self.mapping_id = mapping_id
+        self.payload = payload
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+    def __repr__(self):
+        return f"Edit({self.kind!r}, {self.mapping_id!r})"
+
+
+def is_tmp_id(mapping_id) -> bool:
+    return isinstance(mapping_id, str) and mapping_id.startswith(TMP_PREFIX)
+
+
+class MutationQueue:
+    """
+    Write-behind queue of mapping edits for one project and one user.
+
+    Edits are coalesced per mapping id while they wait:
+      create + update -> create (with the updated payload)
+      create + delete -> nothing
+      update + update -> update (last payload wins)
+      update + delete -> delete
+    A mapping that has a pending delete cannot be updated again.
+
+    New mappings get a temporary "tmp-..." id until the backend assigns
+    the real one (see `id_map`).
+
+    `flush()` sends everything through api_async.run_mapping_ops with the
+    /mappings/batch endpoint (deletes individually), in chunks of
+    MAX_BATCH. Every edit gets a report entry:
+      ok        accepted by the backend; `mapping` holds the confirmed
+                mapping (server response, or payload + id) for creates
+                and updates; None for a create whose server id the
+                response did not carry (re-sync to pick it up)
+      retrying  backend unavailable (breaker open, connection error,
+                timeout, 5xx) or not processed (429/503); re-queued
+                without using up an attempt, flushed again with backoff
+                (up to MAX_BACKOFF seconds, at least any Retry-After)
+      conflict  409/412, dropped (the backend version wins)
+      rejected  any other 4xx, dropped
+      unknown   a create whose outcome the backend did not tell (e.g.
+                timeout after sending); dropped rather than sent twice,
+                a re-sync shows whether it was saved
+      failed    anything else; re-queued (up to MAX_ATTEMPTS sends)
+    Re-queued edits yield to a newer edit of the same mapping. Entries
+    for dropped edits (`dropped` is true) accumulate in dropped() until
+    clear_dropped().
+
+    With auto_flush, a timer flushes FLUSH_INTERVAL seconds after the
+    first edit that arrives on an empty queue. The token is captured at
+    construction because the timer thread cannot read session_state.
+    """
+
+    def __init__(self, project, token, on_flushed=None, auto_flush=True, flush_interval=FLUSH_INTERVAL):
+        self.project = project
+        self.token = token
+        self.on_flushed = on_flushed
+        self.auto_flush = auto_flush
+        self.flush_interval = flush_interval
+
+        self.id_map: dict = {}
+        self.last_report: list[dict] = []
+        self.last_flush_at = None
+        self._dropped: list[dict] = []
+        self._retry_delay = None  # set while the backend is unavailable
+        self._retry_at = None
+
+        self._pending: OrderedDict = OrderedDict()
+        self._inflight: list[Edit] = []
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    # ---- enqueue ----
+
+    def create(self, payload: dict) -> str:
+        tmp_id = f"{TMP_PREFIX}{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._pending[tmp_id] = Edit(CREATE, tmp_id, dict(payload))
+        self._schedule()
+        return tmp_id
+
+    def update(self, mapping_id, payload: dict):
+        mapping_id = self.id_map.get(mapping_id, mapping_id)
+        with self._lock:
+            prev = self._pending.get(mapping_id)
+            if prev is not None and prev.kind == DELETE:
+                raise ValueError(f"Mapping {mapping_id} is pending deletion")
+
+            kind = CREATE if prev is not None and prev.kind == CREATE else UPDATE
+            self._pending[mapping_id] = Edit(kind, mapping_id, dict(payload))
+        self._schedule()
+
+    def delete(self, mapping_id):
+        mapping_id = self.id_map.get(mapping_id, mapping_id)
+        with self._lock:
+            prev = self._pending.pop(mapping_id, None)
+            if prev is not None and prev.kind == CREATE:
+                return  # never reached the backend
+            if is_tmp_id(mapping_id):
+                return
+            self._pending[mapping_id] = Edit(DELETE, mapping_id)
+        self._schedule()
+
+    # ---- inspection ----
+
+    def pending(self) -> list[Edit]:
+        """
+        Edits not yet confirmed by the backend (queued + in flight),
+        oldest first. Used to overlay the local mapping set optimistically.
+        """
+        with self._lock:
+            queued = list(self._pending.values())
+            inflight = [e for e in self._inflight if e.mapping_id not in self._pending]
+        return inflight + queued
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            if self._retry_at is not None and time.monotonic() < self._retry_at:
+                return False
+            oldest = next(iter(self._pending.values())).queued_at
+        return len(self) >= MAX_BATCH or time.monotonic() - oldest >= self.flush_interval
+
+    def dropped(self) -> list[dict]:
+        """
+        Report entries of every edit given up on since the last
+        clear_dropped(), oldest first.
+        """
+        with self._lock:
+            return list(self._dropped)
+
+    def clear_dropped(self):
+        with self._lock:
+            self._dropped.clear()
+
+    # ---- flushing ----
+
+    def _schedule(self):
+        if not self.auto_flush:
+            return
+        with self._lock:
+            if self._timer is not None and self._timer.is_alive():
+                return
+            self._timer = threading.Timer(self._retry_delay or self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def flush(self) -> list[dict]:
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None and self._timer is not threading.current_thread():
+                    self._timer.cancel()
+                self._timer = None
+
+                edits = list(self._pending.values())
+                self._pending.clear()
+                self._inflight = edits
+
+            if not edits:
+                return []
+
+            report = []
+            retry_after = 0.0
+            try:
+                for start in range(0, len(edits), MAX_BATCH):
+                    chunk = edits[start:start + MAX_BATCH]
+                    ops = [
+                        MappingOp(
+                            e.kind,
+                            mapping_id=None if e.kind == CREATE else e.mapping_id,
+                            payload=e.payload,
+                            ref=e,
+                        )
+                        for e in chunk
+                    ]
+                    results = asyncio.run(run_mapping_ops(self.project, ops, self.token, use_batch=True))
+                    report.extend(self._settle(r) for r in results)
+                    retry_after = max([retry_after] + [r.retry_after or 0.0 for r in results])
+            finally:
+                with self._lock:
+                    self._inflight = []
+
+            self.last_report = report
+            self.last_flush_at = time.time()
+            with self._lock:
+                self._dropped.extend(e for e in report if e["dropped"])
+                if any(e["status"] == "retrying" for e in report):
+                    # backend unavailable: back off, at least until the breaker half-opens
+                    delay = self.flush_interval if self._retry_delay is None else 2 * self._retry_delay
+                    retry_in = breaker_state().get("retry_in_s") or 0.0
+                    self._retry_delay = min(MAX_BACKOFF, max(delay, retry_in, retry_after))
+                    self._retry_at = time.monotonic() + self._retry_delay
+                else:
+                    self._retry_delay = self._retry_at = None
+
+            if self.on_flushed is not None:
+                self.on_flushed(self.project, report)
+
+            if len(self):
+                self._schedule()
+
+            return report
+
+    def _settle(self, result) -> dict:
+        edit = result.op.ref
+        entry = {
+            "mapping_id": edit.mapping_id,
+            "kind": edit.kind,
+            "status": "ok",
+            "error": None,
+            "server_id": None,
+            "mapping": None,
+            "dropped": False,
+        }
+
+        if result.ok:
+            body = result.result
+            if not (isinstance(body, dict) and body.get("id")):
+                body = None
+            if edit.kind == CREATE and body is not None:
+                self.id_map[edit.mapping_id] = body["id"]
+                entry["server_id"] = body["id"]
+            if edit.kind == UPDATE:
+                entry["mapping"] = body or {**edit.payload, "id": edit.mapping_id}
+            elif edit.kind == CREATE and body is not None:
+                entry["mapping"] = body
+            return entry
+
+        entry["error"] = result.error
+
+        if result.status in CONFLICT_STATUSES:
+            entry["status"] = "conflict"
+        elif result.unknown and edit.kind == CREATE:
+            entry["status"] = "unknown"
+        elif result.backend_failure or result.unknown or result.status in NOT_PROCESSED_STATUSES:
+            # not processed, or updates/deletes by id: safe to send again
+            entry["status"] = "retrying"
+            self._requeue(edit)
+            return entry
+        elif result.status is not None and 400 <= result.status < 500:
+            entry["status"] = "rejected"
+        else:
+            entry["status"] = "failed"
+            edit.attempts += 1
+            if edit.attempts < MAX_ATTEMPTS:
+                self._requeue(edit)
+                return entry
+
+        entry["dropped"] = True
+        return entry
+
+    def _requeue(self, edit: Edit):
+        with self._lock:
+            # keep the failed edit unless the user already changed it again
+            if edit.mapping_id not in self._pending:
+                self._pending[edit.mapping_id] = edit
+                self._pending.move_to_end(edit.mapping_id, last=False)
@@ -4,7 +4,7 @@ import streamlit as st
 
 from ui_stepper import render_stepper, render_bottom_nav
 from auth_ui import render_auth_status
-from data_store import get_master_df 
+from data_store import get_master_index
 
 if "project" not in st.session_state:
     st.switch_page("pages/1_overview.py")
@@ -99,14 +99,13 @@ def _init_granularity_rows():
     - This is frontend-only for now
     - Later this will map 1:1 to backend mapping.transform
     """
-    master_df = get_master_df()
+    master_index = get_master_index()
     selected = st.session_state.get("checked", [])
 
     rows = []
     for leaf_value in selected:
         row_key = leaf_value.replace("ROW:", "")
-        row = master_df.loc[master_df["__row_key__"] == row_key]
-        if row.empty:
+        if row_key not in master_index:
             continue
 
         rows.append({
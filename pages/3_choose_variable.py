@@ -3,8 +3,8 @@ from streamlit_tree_select import tree_select
 
 from ui_stepper import render_stepper, render_bottom_nav
 from auth_ui import render_auth_status
-from tree_utils import build_nodes_and_lookup
-from data_store import get_master_df 
+from data_store import get_master_index, get_variable_tree, search_variables
+from tree_utils import lazy_nodes, prune_nodes, resolve_lazy_checked
 
 if "project" not in st.session_state:
     st.switch_page("pages/1_overview.py")
@@ -39,13 +39,7 @@ if not project:
 # Header
 # -------------------------------------------------
 st.title("Choose variables")
-st.markdown("Expand the categories and select the variables you need.")
-st.markdown(
-    "<div style='opacity:0.6; font-size:0.85rem;'>"
-    "Tip: Use <b>Ctrl+F</b> in your browser to quickly find text on the page."
-    "</div>",
-    unsafe_allow_html=True,
-)
+st.markdown("Expand the categories and select the variables you need, or search for them.")
 
 project_name = (
     st.session_state.get("project_meta", {})
@@ -59,22 +53,14 @@ if project_name:
 # -------------------------------------------------
 # Helpers
 # -------------------------------------------------
-def reset_tree_widget_state():
-    if "var_tree" in st.session_state:
-        del st.session_state["var_tree"]
-
+def tree_widget_key():
+    return f"var_tree_{st.session_state.get('var_tree_gen', 0)}"
 
-def compute_all_expand_values(tree_nodes):
-    expanded = set()
 
-    def walk(nodes):
-        for n in nodes:
-            if isinstance(n, dict) and n.get("children"):
-                expanded.add(n.get("value"))
-                walk(n["children"])
-
-    walk(tree_nodes)
-    return sorted(v for v in expanded if v is not None)
+def reset_tree_widget_state():
+    # the component only reads `checked`/`expanded` until its first
+    # change, so a new key (fresh instance) is the way to push state
+    st.session_state["var_tree_gen"] = st.session_state.get("var_tree_gen", 0) + 1
 
 
 def normalize_checked_values_to_row_format(values: list[str]) -> list[str]:
@@ -121,19 +107,10 @@ st.session_state["checked_all_list"] = normalize_checked_values_to_row_format(
 )
 
 
-# -------------------------------------------------
-# Load + filter master data
-# -------------------------------------------------
-df_master = get_master_df()
-
-
 # -------------------------------------------------
 # HARD safety: remove selections for hidden rows
 # -------------------------------------------------
-if "__row_key__" in df_master.columns:
-    valid_row_keys = set(df_master["__row_key__"].astype(str))
-else:
-    valid_row_keys = set()
+valid_row_keys = get_master_index()
 
 
 def _filter_checked(values):
@@ -150,12 +127,55 @@ st.session_state["checked_all_list"] = _filter_checked(
 
 
 # -------------------------------------------------
-# Build tree (AFTER filtering!)
+# Tree (shared, cached per catalog version + filter)
 # -------------------------------------------------
-nodes, leaf_lookup_master = build_nodes_and_lookup(df_master)
-st.session_state["leaf_lookup_master"] = leaf_lookup_master
+tree = get_variable_tree()
+st.session_state["leaf_lookup_master"] = tree.leaf_lookup
 
-all_expand_values = compute_all_expand_values(nodes)
+
+# -------------------------------------------------
+# Search (server-side index, see search_index.py)
+# -------------------------------------------------
+query = st.text_input(
+    "Search variables",
+    key="var_search",
+    placeholder="Variable name, EPIC ID, PDMS ID, unit or category",
+    on_change=reset_tree_widget_state,
+).strip()
+
+searching = bool(query)
+if searching:
+    with st.spinner("Searching…"):
+        found = search_variables(query)
+
+    # only the matches and the branches above them, all expanded
+    nodes, search_expanded, shown = prune_nodes(tree.nodes, found["values"], tree.index)
+    shown = set(shown)
+    widget_checked = [v for v in st.session_state["checked_all_list"] if v in shown]
+    lazy = {}
+
+    if not found["total"]:
+        st.info(f"No variables match “{query}”.")
+    else:
+        note = " (closest spellings)" if found["fuzzy"] else ""
+        if found["total"] > len(shown):
+            st.caption(
+                f"Showing {len(shown):,} of {found['total']:,} matches{note}. "
+                "Refine the search to see the rest."
+            )
+        else:
+            st.caption(f"{found['total']:,} matches{note}.")
+
+# Large trees: only expanded branches are sent to the browser
+elif tree.lazy:
+    nodes, widget_checked, lazy = lazy_nodes(
+        tree.nodes,
+        st.session_state["expanded"],
+        st.session_state["checked_all_list"],
+        tree.index,
+    )
+else:
+    nodes, widget_checked, lazy = tree.nodes, st.session_state["checked_all_list"], {}
 
 
 # -------------------------------------------------
@@ -164,13 +184,13 @@ all_expand_values = compute_all_expand_values(nodes)
 ctrl_cols = st.columns([1, 1, 6])
 
 with ctrl_cols[0]:
-    if st.button("Expand all", use_container_width=True):
-        st.session_state["expanded"] = all_expand_values
+    if st.button("Expand all", use_container_width=True, disabled=searching):
+        st.session_state["expanded"] = list(tree.expand_values)
         reset_tree_widget_state()
         st.rerun()
 
 with ctrl_cols[1]:
-    if st.button("Collapse all", use_container_width=True):
+    if st.button("Collapse all", use_container_width=True, disabled=searching):
         st.session_state["expanded"] = []
         reset_tree_widget_state()
         st.rerun()
@@ -181,18 +201,32 @@ with ctrl_cols[1]:
 # -------------------------------------------------
 selected = tree_select(
     nodes,
-    checked=st.session_state["checked_all_list"],
-    expanded=st.session_state["expanded"],
-    key="var_tree",
+    checked=widget_checked,
+    expanded=search_expanded if searching else st.session_state["expanded"],
+    key=tree_widget_key(),
 )
 
-checked_now = normalize_checked_values_to_row_format(
-    selected.get("checked", [])
-)
+checked_now = selected.get("checked", [])
+if lazy:
+    checked_now = resolve_lazy_checked(
+        checked_now, lazy, st.session_state["checked_all_list"], tree.index
+    )
+checked_now = normalize_checked_values_to_row_format(checked_now)
+if searching:
+    # selections outside the results are kept as they were
+    checked_now += [v for v in st.session_state["checked_all_list"] if v not in shown]
+expanded_now = selected.get("expanded", [])
+reshape = tree.lazy and not searching and set(expanded_now) != set(st.session_state["expanded"])
 
 st.session_state["checked"] = checked_now
 st.session_state["checked_all_list"] = checked_now
-st.session_state["expanded"] = selected.get("expanded", [])
+if not searching:
+    st.session_state["expanded"] = expanded_now
+
+if reshape:
+    # expanded/collapsed a branch: rebuild with its children loaded/dropped
+    reset_tree_widget_state()
+    st.rerun()
 
 
 # -------------------------------------------------
@@ -4,8 +4,7 @@ from datetime import datetime
 
 from ui_stepper import render_stepper, render_bottom_nav
 from auth_ui import render_auth_status
-from data_store import get_master_df
-from api_client import create_mapping
+from data_store import get_master_df, get_mutation_queue
 
 
 if "project" not in st.session_state:
@@ -236,17 +235,41 @@ if submitted:
             "variable": pdms_id.strip()
         })
 
-    try:
-        create_mapping(project, payload)
+    # Queued + shown immediately; saved in the background via /mappings/batch
+    get_mutation_queue(project).create(payload)
 
-        # Clear Streamlit cache so new mapping appears
-        st.cache_data.clear()
+    st.success("Variable added.")
+    st.rerun()
 
-        st.success("Variable added successfully.")
-        st.rerun()
 
-    except Exception as e:
-        st.error(f"Failed to create mapping: {e}")
+# -------------------------------------------------
+# Pending changes (write-behind queue)
+# -------------------------------------------------
+queue = get_mutation_queue(project)
+
+if len(queue):
+    left, right = st.columns([4, 1])
+    with left:
+        st.caption(f"⏳ {len(queue)} change(s) waiting to be saved.")
+    with right:
+        if st.button("Save now", use_container_width=True):
+            queue.flush()
+            st.rerun()
+
+if len(queue) and any(r["status"] == "retrying" for r in queue.last_report):
+    st.caption("⚠️ The backend is unavailable right now; your changes are kept and retried automatically.")
+
+dropped = queue.dropped()
+if dropped:
+    st.warning("These changes could not be saved and were discarded:")
+    st.dataframe(
+        pd.DataFrame(dropped)[["kind", "mapping_id", "status", "error"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+    if st.button("Dismiss"):
+        queue.clear_dropped()
+        st.rerun()
 
 
 st.markdown("---")
@@ -0,0 +1,200 @@
+import bisect
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+SEARCH_FIELDS = ("Variable", "EPIC ID", "PDMS ID", "Unit")
+
+# query terms shorter than this match token prefixes (numbers: whole
+# tokens), longer ones substrings anywhere in a token
+SUBSTRING_MIN = 3
+
+# matches returned to the page (the rest are counted, not shown)
+MAX_RESULTS = int(os.getenv("KIM_SEARCH_MAX_RESULTS", "500"))
+
+# trigram (Dice) similarity a word needs to count as a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.5
+
+_TOKEN = re.compile(r"[^\W_]+")
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def tokenize(text) -> list[str]:
+    if not isinstance(text, str) or not text:
+        return []
+    return _TOKEN.findall(text.casefold())
+
+
+def _trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# -------------------------------------------------
+# Index
+# -------------------------------------------------
+
+class SearchHits:
+    __slots__ = ("positions", "fuzzy")
+
+    def __init__(self, positions: np.ndarray, fuzzy: bool = False):
+        self.positions = positions
+        self.fuzzy = fuzzy
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class SearchIndex:
+    """
+    Full-text index over the rows of one master frame (positions 0..n-1):
+
+    - inverted index: token -> sorted row positions
+    - prefix lookups: bisect over the sorted vocabulary
+    - substring lookups: one C-level scan of the newline-joined
+      vocabulary, match offsets mapped back to tokens
+    - fuzzy lookups: trigram index over the alphabetic words, used for
+      query terms that match nothing otherwise (typos)
+
+    Every query term must match (AND); a term matches a row if any token
+    of Variable, EPIC ID, PDMS ID, Unit or the classification path does.
+    Read-only once built.
+    """
+
+    def __init__(self, frame: pd.DataFrame, paths=None):
+        """
+        paths: per-row classification path (sequence of segments);
+        defaults to the frame's Organ System / Group.
+        """
+        self.size = len(frame)
+        postings: dict = {}
+
+        def add(pos, tokens):
+            for token in tokens:
+                rows = postings.get(token)
+                if rows is None:
+                    postings[token] = [pos]
+                elif rows[-1] != pos:
+                    rows.append(pos)
+
+        columns = [frame[c].tolist() for c in SEARCH_FIELDS if c in frame.columns]
+        if paths is None:
+            paths = zip(frame["Organ System"].tolist(), frame["Group"].tolist())
+
+        path_tokens: dict = {}
+        for pos, path in enumerate(paths):
+            for values in columns:
+                add(pos, tokenize(values[pos]))
+
+            # paths repeat a lot: tokenize each distinct one once
+            tokens = path_tokens.get(path)
+            if tokens is None:
+                tokens = path_tokens[path] = [t for segment in path for t in tokenize(segment)]
+            add(pos, tokens)
+
+        self._tokens = sorted(postings)
+        self._postings = [np.asarray(postings[t], dtype=np.int32) for t in self._tokens]
+
+        # substring scan: "\n".join(tokens), with each token's start offset
+        self._blob = "\n".join(self._tokens)
+        self._offsets = []
+        offset = 0
+        for t in self._tokens:
+            self._offsets.append(offset)
+            offset += len(t) + 1
+
+        self._trigram_words = None  # built on the first fuzzy lookup
+
+    def __len__(self):
+        return self.size
+
+    # ---- term -> token ids ----
+
+    def _exact(self, term: str) -> list[int]:
+        i = bisect.bisect_left(self._tokens, term)
+        return [i] if i < len(self._tokens) and self._tokens[i] == term else []
+
+    def _prefix(self, term: str) -> range:
+        lo = bisect.bisect_left(self._tokens, term)
+        hi = bisect.bisect_left(self._tokens, term + "\U0010ffff")
+        return range(lo, hi)
+
+    def _substring(self, term: str) -> list[int]:
+        ids = []
+        offsets = self._offsets
+        blob = self._blob
+        start = blob.find(term)
+        while start != -1:
+            token_id = bisect.bisect_right(offsets, start) - 1
+            ids.append(token_id)
+            # continue after this token
+            start = blob.find(term, offsets[token_id] + len(self._tokens[token_id]) + 1)
+        return ids
+
+    def _fuzzy(self, term: str) -> list[int]:
+        if self._trigram_words is None:
+            index: dict = {}
+            for token_id, token in enumerate(self._tokens):
+                if token.isalpha():
+                    for gram in _trigrams(token):
+                        index.setdefault(gram, []).append(token_id)
+            self._trigram_words = index
+
+        grams = _trigrams(term)
+        shared: dict = {}
+        for gram in grams:
+            for token_id in self._trigram_words.get(gram, ()):
+                shared[token_id] = shared.get(token_id, 0) + 1
+
+        ids = []
+        for token_id, n in shared.items():
+            similarity = 2 * n / (len(grams) + len(self._tokens[token_id]) + 1)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                ids.append(token_id)
+        return ids
+
+    def _rows(self, token_ids) -> np.ndarray:
+        parts = [self._postings[i] for i in token_ids]
+        if not parts:
+            return _EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return np.unique(np.concatenate(parts))
+
+    # ---- query ----
+
+    def search(self, query: str, fuzzy: bool = True) -> SearchHits:
+        """
+        Row positions matching every term of `query`, ascending.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return SearchHits(_EMPTY)
+
+        result = None
+        used_fuzzy = False
+        # most selective (longest) terms first, so the AND shrinks early
+        for term in sorted(set(terms), key=len, reverse=True):
+            if len(term) >= SUBSTRING_MIN:
+                token_ids = self._substring(term)
+            elif term.isdigit():
+                token_ids = self._exact(term)
+            else:
+                token_ids = self._prefix(term)
+            if not token_ids and fuzzy and len(term) >= SUBSTRING_MIN:
+                token_ids = self._fuzzy(term)
+                used_fuzzy = used_fuzzy or bool(token_ids)
+
+            rows = self._rows(token_ids)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+
+        return SearchHits(result, used_fuzzy)
@@ -0,0 +1,117 @@
+import threading
+
+
+# -------------------------------------------------
+# Single-flight: one in-flight call per key
+# -------------------------------------------------
+
+class _Call:
+    __slots__ = ("event", "result", "error", "scope", "waiters")
+
+    def __init__(self, scope):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.scope = scope
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution of `fn`.
+
+    The first caller (leader) runs `fn`; callers arriving while it is in
+    flight (followers) block until it finishes and receive the same result
+    or exception. Nothing is cached afterwards: the next call after
+    completion starts a new flight.
+
+    Authorization: the leader's result was fetched with the leader's
+    credential. A follower with a different `scope` (credential
+    fingerprint) must pass its own `verify()` first, e.g. a cheap
+    "can I read this project" request, so it never receives data its own
+    token could not have fetched. The shared result must be treated as
+    read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "verified": 0,
+            "rejected": 0,
+            "errors": 0,
+        }
+
+    def do(self, key, fn, scope=None, verify=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(scope)
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.event.set()
+            return call.result
+
+        if scope != call.scope:
+            if verify is None:
+                # no way to check this caller -> run its own request
+                with self._lock:
+                    self._stats["rejected"] += 1
+                return fn()
+            try:
+                verify()
+            except BaseException:
+                with self._lock:
+                    self._stats["rejected"] += 1
+                raise
+            with self._lock:
+                self._stats["verified"] += 1
+
+        call.event.wait()
+
+        with self._lock:
+            self._stats["coalesced"] += 1
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "in_flight": len(self._calls),
+                "waiting": sum(c.waiters for c in self._calls.values()),
+            }
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+
+_flight = SingleFlight()
+
+
+def single_flight(key, fn, scope=None, verify=None):
+    return _flight.do(key, fn, scope=scope, verify=verify)
+
+
+def single_flight_stats() -> dict:
+    return _flight.stats()
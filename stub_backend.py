@@ -0,0 +1,529 @@
+"""
+Local stand-in for the VarMap backend, for offline development and
+benchmarks at scale.
+
+    python stub_backend.py --mappings 100000 --latency-ms 30
+    KIM_API_BASE_URL=http://127.0.0.1:8765 KIM_FRONTEND_URL=http://localhost:8501 \\
+        streamlit run streamlit_app.py
+
+Routes (same shapes as the real backend, as used by api_client):
+    GET    /                                  health
+    GET    /me
+    GET    /auth/login?origin=...             redirects back with ?access_token=stub
+    GET    /projects
+    POST   /projects
+    GET    /projects/{name}
+    PATCH  /projects/{name}/config
+    GET    /projects/{name}/mappings          ETag/304, gzip, ?limit=&cursor=,
+                                              X-Mappings-Version
+    GET    /projects/{name}/mappings/changes  ?since=<version>[&limit=]; 410 once
+                                              `since` is older than the kept history
+    POST   /projects/{name}/mappings
+    PUT    /projects/{name}/mappings/batch
+    PUT    /projects/{name}/mappings/{id}
+    DELETE /projects/{name}/mappings/{id}
+
+Any bearer token is accepted. Latency (+ jitter) and a random 503 rate
+can be injected to exercise retries and the circuit breaker.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# -------------------------------------------------
+# Synthetic mapping generator
+# -------------------------------------------------
+
+ORGAN_SYSTEMS = [
+    "Cardiovascular", "Respiratory", "Renal", "Neurology", "Hepatic",
+    "Hematology", "Infectious disease", "Metabolic", "Fluid balance",
+    "Medication", "Scores", "General",
+]
+GROUPS = [
+    "Vitals", "Labs", "Blood gas", "Devices", "Infusions", "Scores",
+    "Monitoring", "Ventilation", "Assessments", "Imaging", "Orders",
+]
+ANALYTES = [
+    "Heart rate", "Systolic blood pressure", "Diastolic blood pressure",
+    "Mean arterial pressure", "Central venous pressure", "SpO2",
+    "Respiratory rate", "Tidal volume", "PEEP", "FiO2", "pH", "pCO2", "pO2",
+    "Lactate", "Creatinine", "Urea", "Potassium", "Sodium", "Chloride",
+    "Glucose", "Bilirubin", "ALT", "AST", "Hemoglobin", "Platelets",
+    "Leukocytes", "CRP", "Procalcitonin", "Temperature", "GCS", "RASS",
+    "Urine output", "Noradrenaline rate", "Propofol rate", "Fluid intake",
+]
+QUALIFIERS = [
+    "", "arterial", "venous", "invasive", "non-invasive", "point of care",
+    "calculated", "manual", "device", "24h",
+]
+UNITS = ["", "mmHg", "bpm", "%", "°C", "kg", "g/L", "mg/L", "mmol/L", "mL", "L/min", "µg/kg/min", "score"]
+
+
+def generate_mappings(
+    n: int,
+    depth: int | tuple[int, int] = 2,
+    epic_ratio: float = 0.7,
+    pdms_ratio: float = 0.6,
+    seed: int = 0,
+    id_prefix: str = "m",
+) -> list[dict]:
+    """
+    Deterministic, realistic-looking mapping set.
+
+    depth: classification.path length, or (min, max) for a mix of depths;
+    levels beyond Organ System / Group are named "<Group> <k>".
+    epic_ratio / pdms_ratio: probability that a mapping has that source;
+    every mapping gets at least one source.
+    """
+    rng = random.Random(seed)
+    min_depth, max_depth = (depth, depth) if isinstance(depth, int) else depth
+    out = []
+
+    for i in range(n):
+        organ = ORGAN_SYSTEMS[rng.randrange(len(ORGAN_SYSTEMS))]
+        group = GROUPS[rng.randrange(len(GROUPS))]
+        path_depth = max(1, rng.randint(min_depth, max_depth))
+        path = [organ, group][:path_depth]
+
+        for level in range(2, path_depth):
+            path.append(f"{group} {level - 1}.{rng.randrange(1, 6)}")
+
+        qualifier = QUALIFIERS[rng.randrange(len(QUALIFIERS))]
+        name = ANALYTES[rng.randrange(len(ANALYTES))]
+        if qualifier:
+            name = f"{name} ({qualifier})"
+        name = f"{name} #{i}"
+
+        has_epic = rng.random() < epic_ratio
+        has_pdms = rng.random() < pdms_ratio
+        if not has_epic and not has_pdms:
+            has_epic = rng.random() < 0.5
+            has_pdms = not has_epic
+
+        source = []
+        if has_epic:
+            source.append({"system": "EPIC", "variable": f"EPIC_{rng.randrange(10**6, 10**7)}"})
+        if has_pdms:
+            source.append({"system": "PDMS", "variable": f"PDMS.{organ[:4].upper()}.{i}"})
+
+        out.append({
+            "id": f"{id_prefix}{i:07d}",
+            "name": name,
+            "unit": UNITS[rng.randrange(len(UNITS))],
+            "status": "active",
+            "classification": {"path": path},
+            "source": source,
+        })
+
+    return out
+
+
+# -------------------------------------------------
+# In-memory backend state
+# -------------------------------------------------
+
+class _Project:
+    """
+    Every change bumps `version` and logs (version, mapping id); the last
+    `history` log entries are kept to answer /mappings/changes.
+    """
+
+    def __init__(self, name, mappings, display_name=None, allowed_users=None, default=False, history=10_000):
+        self.name = name
+        self.display_name = display_name or name
+        self.allowed_users = allowed_users or []
+        self.default = default
+        self.config = {}
+        self.mappings = {m["id"]: m for m in mappings}
+        self.version = 1
+        self.history = history
+        self._log = []          # (version, mapping id), ascending
+        self._floor = 1         # oldest `since` the log can still answer
+        self._body = None  # (version, raw, gzipped)
+
+    def meta(self):
+        return {
+            "name": self.name,
+            "display_name": self.display_name,
+            "allowed_users": self.allowed_users,
+            "default": self.default,
+            "config": self.config,
+        }
+
+    def etag(self):
+        return f'"{self.name}-v{self.version}"'
+
+    def touch(self, *ids):
+        self.version += 1
+        self._body = None
+        self._log.extend((self.version, i) for i in ids)
+        if len(self._log) > self.history:
+            drop = len(self._log) - self.history
+            self._floor = self._log[drop - 1][0]
+            del self._log[:drop]
+
+    def changes_since(self, since: int):
+        """
+        (upserted mappings, deleted ids) after version `since`, or None
+        when the log no longer reaches back that far.
+        """
+        if since < self._floor or since > self.version:
+            return None
+        start = bisect.bisect_right(self._log, since, key=lambda e: e[0])
+        ids = dict.fromkeys(i for _, i in self._log[start:])
+        upserts = [self.mappings[i] for i in ids if i in self.mappings]
+        deletes = [i for i in ids if i not in self.mappings]
+        return upserts, deletes
+
+    def body(self):
+        if self._body is None or self._body[0] != self.version:
+            raw = json.dumps(list(self.mappings.values()), separators=(",", ":")).encode("utf-8")
+            self._body = (self.version, raw, None)
+        return self._body[1]
+
+    def gzipped_body(self):
+        raw = self.body()
+        if self._body[2] is None:
+            self._body = (self._body[0], raw, gzip.compress(raw, compresslevel=5))
+        return self._body[2]
+
+
+class StubState:
+    def __init__(self, history=10_000):
+        self.lock = threading.RLock()
+        self.projects: dict = {}
+        self.history = history
+
+    def add_project(self, name, mappings, **meta):
+        with self.lock:
+            self.projects[name] = _Project(name, mappings, history=self.history, **meta)
+            return self.projects[name]
+
+
+# -------------------------------------------------
+# HTTP handler
+# -------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    state: StubState = None
+    latency_s = 0.0
+    jitter_s = 0.0
+    error_rate = 0.0
+
+    # ---- plumbing ----
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None, ctype="application/json"):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if body or status not in (204, 304):
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _json(self, status, obj, headers=None):
+        self._send(status, json.dumps(obj, separators=(",", ":")).encode("utf-8"), headers)
+
+    def _read_body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _read_json(self):
+        raw = self._request_body
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        return json.loads(raw) if raw else None
+
+    def _inject(self) -> bool:
+        delay = self.latency_s + (random.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self._json(503, {"detail": "injected failure"})
+            return True
+        return False
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization", "").startswith("Bearer "):
+            return True
+        self._json(401, {"detail": "Not authenticated"})
+        return False
+
+    def _route(self, method):
+        # read the body before any answer: left unread, the keep-alive
+        # connection would parse it as the start of the next request
+        self._request_body = self._read_body()
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+
+        if method == "GET" and not parts:
+            return self._json(200, {"status": "ok"})
+
+        if method == "GET" and parts == ["auth", "login"]:
+            origin = (query.get("origin") or [""])[0].rstrip("/")
+            return self._send(302, headers={"Location": f"{origin}/?access_token=stub-{uuid.uuid4().hex[:8]}"})
+
+        if self._inject() or not self._authorized():
+            return None
+
+        if method == "GET" and parts == ["me"]:
+            token = self.headers["Authorization"][len("Bearer "):]
+            return self._json(200, {"login": token, "name": "Stub user"})
+
+        if not parts or parts[0] != "projects":
+            return self._json(404, {"detail": "Not found"})
+
+        state = self.state
+        with state.lock:
+            if len(parts) == 1:
+                if method == "GET":
+                    return self._json(200, [p.meta() for p in state.projects.values()])
+                if method == "POST":
+                    return self._create_project(self._read_json() or {})
+
+            project = state.projects.get(parts[1])
+            if project is None:
+                return self._json(404, {"detail": f"Project {parts[1]} not found"})
+
+            rest = parts[2:]
+            if not rest and method == "GET":
+                return self._json(200, project.meta())
+            if rest == ["config"] and method == "PATCH":
+                project.config.update(self._read_json() or {})
+                return self._json(200, project.meta())
+            if rest and rest[0] == "mappings":
+                return self._mappings(method, project, rest[1:], query)
+
+        return self._json(405, {"detail": "Method not allowed"})
+
+    # ---- projects ----
+
+    def _create_project(self, payload):
+        name = payload.get("name")
+        if not name:
+            return self._json(422, {"detail": "name required"})
+        if name in self.state.projects:
+            return self._json(409, {"detail": "Project exists"})
+
+        source = self.state.projects.get(payload.get("from_project") or "")
+        mappings = [dict(m) for m in source.mappings.values()] if source else []
+        project = self.state.add_project(
+            name,
+            mappings,
+            display_name=payload.get("display_name"),
+            allowed_users=payload.get("allowed_users"),
+        )
+        return self._json(201, project.meta())
+
+    # ---- mappings ----
+
+    def _mappings(self, method, project, rest, query):
+        if not rest:
+            if method == "GET":
+                return self._list_mappings(project, query)
+            if method == "POST":
+                m = dict(self._read_json() or {})
+                m["id"] = m.get("id") or uuid.uuid4().hex
+                project.mappings[m["id"]] = m
+                project.touch(m["id"])
+                return self._json(201, m)
+
+        elif rest == ["batch"] and method == "PUT":
+            out = []
+            for m in self._read_json() or []:
+                m = dict(m)
+                m["id"] = m.get("id") or uuid.uuid4().hex
+                project.mappings[m["id"]] = m
+                out.append(m)
+            project.touch(*(m["id"] for m in out))
+            return self._json(200, out)
+
+        elif rest == ["changes"] and method == "GET":
+            return self._changes(project, query)
+
+        elif len(rest) == 1:
+            mapping_id = rest[0]
+            if mapping_id not in project.mappings:
+                return self._json(404, {"detail": f"Mapping {mapping_id} not found"})
+            if method == "PUT":
+                m = dict(self._read_json() or {})
+                m["id"] = mapping_id
+                project.mappings[mapping_id] = m
+                project.touch(mapping_id)
+                return self._json(200, m)
+            if method == "DELETE":
+                del project.mappings[mapping_id]
+                project.touch(mapping_id)
+                return self._json(200, {"deleted": mapping_id})
+
+        return self._json(405, {"detail": "Method not allowed"})
+
+    def _list_mappings(self, project, query):
+        etag = project.etag()
+        version = {"X-Mappings-Version": str(project.version)}
+
+        if "limit" in query:
+            limit = max(1, int(query["limit"][0]))
+            offset = int((query.get("cursor") or ["0"])[0])
+            items = list(project.mappings.values())[offset:offset + limit]
+            headers = {"ETag": etag, **version}
+            if offset + limit < len(project.mappings):
+                headers["X-Next-Cursor"] = str(offset + limit)
+            return self._json(200, items, headers)
+
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag, **version})
+
+        headers = {"ETag": etag, **version}
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            headers["Content-Encoding"] = "gzip"
+            return self._send(200, project.gzipped_body(), headers)
+        return self._send(200, project.body(), headers)
+
+    def _changes(self, project, query):
+        try:
+            since = int((query.get("since") or [""])[0])
+        except ValueError:
+            return self._json(422, {"detail": "since must be a version number"})
+
+        changes = project.changes_since(since)
+        if changes is None:
+            return self._json(410, {"detail": f"No history since version {since}"})
+
+        upserts, deletes = changes
+        body = {"version": str(project.version), "etag": project.etag()}
+        limit = int((query.get("limit") or ["0"])[0])
+        if limit and len(upserts) + len(deletes) > limit:
+            body["truncated"] = True
+        else:
+            body.update(upserts=upserts, deletes=deletes)
+        return self._json(200, body)
+
+    # ---- verbs ----
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+# -------------------------------------------------
+# Server
+# -------------------------------------------------
+
+class StubBackend:
+    """
+    In-process stub server; use as a context manager in benchmarks:
+
+        with StubBackend(mappings=generate_mappings(100_000)) as stub:
+            os.environ["KIM_API_BASE_URL"] = stub.url
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        mappings=None,
+        project="default",
+        latency_ms=0.0,
+        jitter_ms=0.0,
+        error_rate=0.0,
+        history=10_000,
+    ):
+        self.state = StubState(history)
+        self.state.add_project(project, mappings or [], default=True)
+
+        handler = type("StubHandler", (_Handler,), {
+            "state": self.state,
+            "latency_s": latency_ms / 1000,
+            "jitter_s": jitter_ms / 1000,
+            "error_rate": error_rate,
+        })
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--project", default="default")
+    parser.add_argument("--mappings", type=int, default=10_000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--max-depth", type=int, default=None, help="mix depths between --depth and this")
+    parser.add_argument("--epic-ratio", type=float, default=0.7)
+    parser.add_argument("--pdms-ratio", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--history", type=int, default=10_000, help="change log entries kept for /mappings/changes")
+    args = parser.parse_args()
+
+    depth = (args.depth, args.max_depth) if args.max_depth else args.depth
+    start = time.perf_counter()
+    mappings = generate_mappings(args.mappings, depth, args.epic_ratio, args.pdms_ratio, args.seed)
+    print(f"generated {len(mappings):,} mappings in {time.perf_counter() - start:.1f}s")
+
+    stub = StubBackend(
+        args.host, args.port, mappings, args.project,
+        args.latency_ms, args.jitter_ms, args.error_rate, args.history,
+    )
+    print(f"stub backend on {stub.url}  (export KIM_API_BASE_URL={stub.url})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Catalog snapshots round-trip mappings whose ids and values are not strings.
+
+    python -m pytest tests/test_catalog_snapshot.py
+    python tests/test_catalog_snapshot.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["KIM_CATALOG_SNAPSHOT_DIR"] = os.path.join(tempfile.mkdtemp(), "catalog")
+
+import catalog_snapshot  # noqa: E402
+from mapping_columns import mappings_to_df  # noqa: E402
+from mapping_store import build_store  # noqa: E402
+
+MAPPINGS = [
+    {"id": 1, "name": "a", "unit": 5, "classification": {"path": ["o", "g"]},
+     "source": [{"system": "EPIC", "variable": 7}]},
+    {"id": "1", "name": "b", "unit": "mg", "classification": {"path": ["o", "g", 3]}},
+    {"id": 2.5, "name": 3, "unit": None, "classification": {"path": []}},
+]
+
+
+def test_non_str_ids_round_trip():
+    if not catalog_snapshot.enabled():
+        return  # pyarrow not installed
+
+    frame = mappings_to_df(MAPPINGS)
+    store = build_store(MAPPINGS)
+    assert catalog_snapshot.save_snapshot("non-str", frame, store, etag="e1")
+
+    snap = catalog_snapshot.load_snapshot("non-str")
+    assert snap is not None and snap.etag == "e1"
+    assert snap.frame["__row_key__"].tolist() == [1, "1", 2.5]
+    assert snap.frame["Unit"].tolist()[:2] == [5, "mg"]
+    assert snap.frame["EPIC ID"].tolist()[0] == 7
+
+    loaded = snap.load_store()
+    for m in MAPPINGS:
+        assert loaded.get(m["id"]).to_dict() == store.get(m["id"]).to_dict()
+
+
+def test_text_only_catalog_round_trip():
+    if not catalog_snapshot.enabled():
+        return
+
+    mappings = [{"id": "m1", "name": "x", "unit": "mmHg", "classification": {"path": ["o", "g"]}}]
+    frame = mappings_to_df(mappings)
+    assert catalog_snapshot.save_snapshot("text", frame, build_store(mappings))
+
+    snap = catalog_snapshot.load_snapshot("text")
+    assert snap.frame["__row_key__"].tolist() == ["m1"]
+    assert snap.load_store().get("m1").to_dict() == build_store(mappings).get("m1").to_dict()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
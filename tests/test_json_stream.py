@@ -0,0 +1,62 @@
+"""
+JsonArrayStream fed the same document split at every byte boundary.
+
+    python -m pytest tests/test_json_stream.py
+    python tests/test_json_stream.py
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import JsonArrayStream  # noqa: E402
+
+
+def _parse(chunks):
+    parser = JsonArrayStream()
+    out = []
+    for chunk in chunks:
+        out.extend(parser.feed(chunk))
+    out.extend(parser.close())
+    return out
+
+
+def _splits(raw: bytes):
+    for i in range(len(raw) + 1):
+        yield [raw[:i], raw[i:]]
+    yield [raw[i:i + 1] for i in range(len(raw))]
+
+
+def test_scalars_split_at_every_boundary():
+    doc = [1, 2.5, -3e-2, 10, True, False, None, "x", 1234567]
+    raw = json.dumps(doc).encode()
+    for chunks in _splits(raw):
+        assert _parse(chunks) == doc, chunks
+
+
+def test_number_cut_before_fraction():
+    assert _parse([b"[1, 2.", b"5, 3]"]) == [1, 2.5, 3]
+    assert _parse([b"[1, 2", b"e3]"]) == [1, 2000.0]
+
+
+def test_objects_and_multibyte_text_split_at_every_boundary():
+    doc = [{"id": "m1", "name": "Hämoglobin", "path": ["Blut", "Labor"]}, {"n": 7}, [1, [2]]]
+    raw = json.dumps(doc, ensure_ascii=False).encode()
+    for chunks in _splits(raw):
+        assert _parse(chunks) == doc, chunks
+
+
+def test_invalid_number_still_fails():
+    try:
+        _parse([b"[1, 2x", b", 3]"])
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,36 @@
+"""
+mappings_to_df on classification paths with missing or null levels.
+
+    python -m pytest tests/test_mapping_columns.py
+    python tests/test_mapping_columns.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapping_columns import apply_delta, mappings_to_df  # noqa: E402
+
+
+def test_null_path_levels_become_unknown():
+    df = mappings_to_df([
+        {"id": 1, "classification": {"path": [None, "g"]}},
+        {"id": 2, "classification": {"path": ["o", None]}},
+        {"id": 3, "classification": {"path": []}, "unit": None},
+    ])
+    assert df["Organ System"].tolist() == ["Unknown", "o", "General"]
+    assert df["Group"].tolist() == ["g", "Unknown", "General"]
+
+
+def test_delta_with_null_path_level():
+    df = mappings_to_df([{"id": "a", "classification": {"path": ["o", "g"]}}])
+    out = apply_delta(df, upserts=[{"id": "b", "classification": {"path": [None, None, "x"]}}])
+    assert out["Organ System"].tolist() == ["o", "Unknown"]
+    assert out["Group"].tolist() == ["g", "Unknown"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
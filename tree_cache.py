@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+
+from singleflight import single_flight
+from tree_utils import LeafLookup, TreeIndex, build_nodes_and_lookup, compute_all_expand_values
+
+
+# -------------------------------------------------
+# Config
+# -------------------------------------------------
+
+# Variable trees kept across reruns and sessions (LRU)
+MAX_TREES = int(os.getenv("KIM_TREE_CACHE_SIZE", "8"))
+
+# Above this many leaves the page renders the tree lazily (collapsed
+# branches without children, see tree_utils.lazy_nodes)
+LAZY_MIN_LEAVES = int(os.getenv("KIM_TREE_LAZY_MIN_LEAVES", "2000"))
+
+# Merge single-child branch chains into one node ("A / B", keeping the
+# deepest value); off by default so node values and labels stay as they are
+COLLAPSE_CHAINS = bool(int(os.getenv("KIM_TREE_COLLAPSE_CHAINS", "0")))
+
+
+# -------------------------------------------------
+# Tree (derived from one filtered master frame)
+# -------------------------------------------------
+
+class VariableTree:
+    """
+    Everything the choose-variable page derives from the master frame:
+    tree_select nodes, the "Expand all" values and the leaf lookup
+    (leaf value -> row, positions into the shared frame). Shared by every
+    session that shows the same frame, so all of it is read-only.
+    """
+
+    __slots__ = ("fingerprint", "nodes", "expand_values", "leaf_lookup", "_index")
+
+    def __init__(self, fingerprint, nodes, expand_values, leaf_lookup: LeafLookup):
+        self.fingerprint = fingerprint
+        self.nodes = nodes
+        self.expand_values = tuple(expand_values)
+        self.leaf_lookup = leaf_lookup
+        self._index = None
+
+    def __len__(self):
+        return len(self.leaf_lookup)
+
+    @property
+    def lazy(self) -> bool:
+        return len(self) > LAZY_MIN_LEAVES
+
+    @property
+    def index(self) -> TreeIndex:
+        # built on first use; a concurrent duplicate build is harmless
+        if self._index is None:
+            self._index = TreeIndex(self.nodes)
+        return self._index
+
+
+def build_tree(fingerprint, df) -> VariableTree:
+    nodes, leaf_lookup = build_nodes_and_lookup(df, collapse_chains=COLLAPSE_CHAINS)
+    return VariableTree(fingerprint, nodes, compute_all_expand_values(nodes), leaf_lookup)
+
+
+def tree_fingerprint(project: str, version: int, source_filter: str, edits=None) -> tuple:
+    """
+    Cheap content key of a filtered master frame: catalog versions are
+    unique per process, so (project, version, filter) identifies the
+    rows; pending edits (each Edit object is new per change) add the
+    session's overlay.
+    """
+    overlay = tuple((e.kind, e.mapping_id, e.queued_at) for e in edits) if edits else ()
+    return (project, version, source_filter, overlay)
+
+
+# -------------------------------------------------
+# Cache (process-wide LRU)
+# -------------------------------------------------
+
+class TreeCache:
+    """
+    LRU of VariableTrees by fingerprint. Concurrent misses on the same
+    fingerprint share one build (single_flight).
+    """
+
+    def __init__(self, max_entries: int = MAX_TREES):
+        self.max_entries = max_entries
+        self._trees: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(self, fingerprint, frame) -> VariableTree:
+        """
+        The tree for `fingerprint`; on a miss it is built from frame()
+        (called only then).
+        """
+        with self._lock:
+            tree = self._trees.get(fingerprint)
+            if tree is not None:
+                self._trees.move_to_end(fingerprint)
+                self._stats["hits"] += 1
+                return tree
+            self._stats["misses"] += 1
+
+        tree = single_flight(("tree", fingerprint), lambda: build_tree(fingerprint, frame()))
+
+        with self._lock:
+            self._trees[fingerprint] = tree
+            self._trees.move_to_end(fingerprint)
+            while len(self._trees) > self.max_entries:
+                self._trees.popitem(last=False)
+                self._stats["evictions"] += 1
+        return tree
+
+    def clear(self):
+        with self._lock:
+            self._trees.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._trees),
+                "leaves": sum(len(t) for t in self._trees.values()),
+            }
+
+
+_cache = TreeCache()
+
+
+def get_tree_cache() -> TreeCache:
+    return _cache
+
+
+def tree_cache_stats() -> dict:
+    return _cache.stats()
@@ -1,6 +1,12 @@
 # tree_utils.py
 import hashlib
 import json
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from mapping_columns import SUBPATH_SEP
 
 
 def _make_row_key(row: dict, cols: list[str]) -> str:
@@ -17,22 +23,94 @@ def _make_row_key(row: dict, cols: list[str]) -> str:
     return hashlib.md5(raw.encode("utf-8")).hexdigest()[:10]
 
 
-def build_nodes_and_lookup(df):
+def _hierarchy_labels(series: pd.Series) -> pd.Series:
+    # fillna("Unknown").astype(str), also for categoricals without that category
+    return series.astype(object).where(series.notna(), "Unknown").astype(str)
+
+
+def _group_starts(*codes: np.ndarray) -> np.ndarray:
+    """
+    Positions where any of the (sorted) code arrays changes value,
+    including 0.
+    """
+    changed = np.zeros(len(codes[0]), dtype=bool)
+    changed[:1] = True
+    for c in codes:
+        changed[1:] |= c[1:] != c[:-1]
+    return np.flatnonzero(changed)
+
+
+def _hierarchy_label(value) -> str:
+    # scalar version of _hierarchy_labels
+    return "Unknown" if pd.isna(value) else str(value)
+
+
+class LeafLookup(Mapping):
+    """
+    Read-only mapping leaf value -> row of the frame the tree was built
+    from. It stores only each leaf's row position (the frame itself is
+    the shared catalog view, or a session's overlay); the row dict is
+    built on access, with the same content as the old per-leaf
+    row.to_dict() (hierarchy labels filled, __row_key__ as str).
+
+        lookup[value]             row dict
+        lookup.position(value)    row position in lookup.frame, or None
+        lookup.rows(values)       those rows as a frame
     """
-    Build the tree nodes and a lookup dict from leaf_value -> row_dict.
+
+    __slots__ = ("frame", "_positions")
+
+    def __init__(self, frame: pd.DataFrame, values, positions):
+        self.frame = frame
+        self._positions = dict(zip(values, np.asarray(positions).tolist()))
+
+    def __getitem__(self, value) -> dict:
+        row = self.frame.iloc[self._positions[value]].to_dict()
+        for c in ("Organ System", "Group", "Variable"):
+            row[c] = _hierarchy_label(row[c])
+        row["__row_key__"] = str(row["__row_key__"])
+        return row
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, value):
+        return value in self._positions
+
+    def position(self, value) -> int | None:
+        return self._positions.get(value)
+
+    def rows(self, values) -> pd.DataFrame:
+        get = self._positions.get
+        found = [p for p in map(get, values) if p is not None]
+        return self.frame.take(found).reset_index(drop=True)
+
+
+def build_nodes_and_lookup(df, collapse_chains: bool = False):
+    """
+    Build the tree nodes and a LeafLookup from leaf_value -> row.
 
     KEY POINT:
     - Leaves are identified by a STABLE value: "ROW:<__row_key__>"
     - This function expects '__row_key__' to already exist in df.
       (Create it once in your data loading/upsert logic, not here.)
-    """
-    df = df.copy()
 
-    # Fill hierarchy columns for grouping
-    for col in ["Organ System", "Group", "Variable"]:
-        if col in df.columns:
-            df[col] = df[col].fillna("Unknown").astype(str)
+    The hierarchy is the full classification path: Organ System, Group
+    and the levels in __subpath__ (if any). Branch values are
+    "OS:<organ>" and "GR:<organ>/<group>[/<level>...]". Within a branch,
+    sub-branches come before its own leaves, both sorted by name.
+
+    The rows are ordered once (a stable lexsort by path rank and
+    Variable); the distinct paths are then inserted into a prefix trie
+    in that order, so each branch is created once and the nodes are built
+    in a single linear pass, with no per-row pandas access.
 
+    collapse_chains: merge a branch whose only child is a branch into
+    that child ("A / B", keeping the child's value).
+    """
     # We require row identity to be present and stable
     if "__row_key__" not in df.columns:
         raise ValueError(
@@ -40,61 +118,284 @@ def build_nodes_and_lookup(df):
             "Create it once in data_store.get_master_df() / upsert_overlay_from_upload()."
         )
 
-    # Ensure row_key is string and unique
-    df["__row_key__"] = df["__row_key__"].astype(str)
-
-    # Keep last occurrence for duplicates (overlay updates, etc.)
-    df = df.drop_duplicates(subset=["__row_key__"], keep="last")
+    # Keep last occurrence for duplicates (overlay updates, etc.);
+    # str() per key (astype(str) would keep None as a missing value)
+    row_keys = pd.Series([str(k) for k in df["__row_key__"].tolist()], dtype=object)
+    keep = np.flatnonzero(~row_keys.duplicated(keep="last").to_numpy())
+    if not len(keep):
+        return [], LeafLookup(df, (), ())
 
-    nodes = []
-    leaf_lookup = {}
+    variables = _hierarchy_labels(df["Variable"]).to_numpy(object)[keep]
+    path_ranks, paths = _path_ranks(df, keep)
 
     # Sort for stable tree ordering
-    df_sorted = df.sort_values(["Organ System", "Group", "Variable"])
+    order = np.lexsort((pd.factorize(variables, sort=True)[0], path_ranks))
+    rows = keep[order]
+    path_ranks = path_ranks[order]
 
-    for os_name, os_df in df_sorted.groupby("Organ System", dropna=False):
-        os_name = str(os_name)
+    # human labels
+    labels = [v.strip() or "(Unnamed variable)" for v in variables[order]]
+    if "Source" in df.columns:
+        labels = [
+            f"{label} ({source})" if source else label
+            for label, source in zip(labels, df["Source"].to_numpy(object)[rows])
+        ]
 
-        os_node = {
-            "label": os_name,
-            "value": f"OS:{os_name}",
-            "children": [],
-        }
+    # STABLE leaf values (selection-safe)
+    values = ["ROW:" + k.strip() for k in row_keys.to_numpy(object)[rows]]
+    leaves = [{"label": label, "value": value} for label, value in zip(labels, values)]
+
+    # lookup leaf -> row position (rows are materialized on access)
+    leaf_lookup = LeafLookup(df, values, rows)
 
-        for group_name, group_df in os_df.groupby("Group", dropna=False):
-            group_name = str(group_name)
+    # prefix trie: consecutive paths share their common prefix, so only
+    # the branches below it are new
+    nodes = []
+    stack = []  # (segment, node) per level of the previous path
+    starts = _group_starts(path_ranks)
+    ends = np.append(starts[1:], len(rows))
 
-            group_node = {
-                "label": group_name,
-                "value": f"GR:{os_name}/{group_name}",
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        path = paths[path_ranks[start]]
+        depth = 0
+        while depth < len(stack) and depth < len(path) and stack[depth][0] == path[depth]:
+            depth += 1
+        del stack[depth:]
+
+        for level in range(depth, len(path)):
+            node = {
+                "label": path[level],
+                "value": branch_value(path[:level + 1]),
                 "children": [],
             }
+            (stack[-1][1]["children"] if stack else nodes).append(node)
+            stack.append((path[level], node))
 
-            for _, row in group_df.iterrows():
-                var = str(row.get("Variable", "")).strip()
-                row_key = str(row["__row_key__"]).strip()
+        stack[-1][1]["children"].extend(leaves[start:end])
 
-                # human label
-                label_parts = [var] if var else ["(Unnamed variable)"]
-                source = row.get("Source")
-                if source:
-                    label_parts.append(f"({source})")
-                label = " ".join(label_parts)
+    if collapse_chains:
+        nodes = [_collapse_chain(n) for n in nodes]
 
-                # STABLE leaf value (selection-safe)
-                leaf_value = f"ROW:{row_key}"
+    return nodes, leaf_lookup
 
-                leaf = {"label": label, "value": leaf_value}
-                group_node["children"].append(leaf)
 
-                # lookup leaf -> full row dict
-                leaf_lookup[leaf_value] = row.to_dict()
+def branch_value(path) -> str:
+    """
+    Stable node value of the branch at `path` (Organ System first).
+    """
+    if len(path) == 1:
+        return f"OS:{path[0]}"
+    return "GR:" + "/".join(path)
 
-            os_node["children"].append(group_node)
 
-        nodes.append(os_node)
+def _path_ranks(df, rows):
+    """
+    Per row (of `rows`), the rank of its classification path in tree
+    order, and the distinct paths (tuples of segments) by rank.
+    """
+    os_codes, os_names = pd.factorize(_hierarchy_labels(df["Organ System"]).to_numpy(object)[rows])
+    group_codes, group_names = pd.factorize(_hierarchy_labels(df["Group"]).to_numpy(object)[rows])
+    if "__subpath__" in df.columns:
+        subpaths = df["__subpath__"].astype(object).where(df["__subpath__"].notna(), "")
+        sub_codes, sub_names = pd.factorize(subpaths.astype(str).to_numpy(object)[rows])
+    else:
+        sub_codes, sub_names = np.zeros(len(rows), dtype=np.intp), np.array([""], dtype=object)
 
-    return nodes, leaf_lookup
+    combined = (
+        os_codes.astype(np.int64) * len(group_names) + group_codes
+    ) * len(sub_names) + sub_codes
+    distinct, inverse = np.unique(combined, return_inverse=True)
+
+    paths = []
+    for code in distinct.tolist():
+        rest, s = divmod(code, len(sub_names))
+        o, g = divmod(rest, len(group_names))
+        sub = sub_names[s]
+        paths.append((os_names[o], group_names[g], *(sub.split(SUBPATH_SEP) if sub else ())))
+
+    # segment by segment; a path's own leaves after its sub-branches
+    by_rank = sorted(range(len(paths)), key=lambda i: [(0, seg) for seg in paths[i]] + [(1, "")])
+    rank = np.empty(len(paths), dtype=np.int64)
+    rank[by_rank] = np.arange(len(paths))
+    return rank[inverse.ravel()], [paths[i] for i in by_rank]
+
+
+def _collapse_chain(node):
+    children = node.get("children")
+    if not children:
+        return node
+    labels = [node["label"]]
+    while len(children) == 1 and children[0].get("children"):
+        node = children[0]
+        labels.append(node["label"])
+        children = node["children"]
+    return {
+        "label": " / ".join(labels),
+        "value": node["value"],
+        "children": [_collapse_chain(c) for c in children],
+    }
+
+
+def compute_all_expand_values(tree_nodes):
+    """
+    Values of every node with children (what "Expand all" expands).
+    """
+    expanded = set()
+
+    def walk(nodes):
+        for n in nodes:
+            if isinstance(n, dict) and n.get("children"):
+                expanded.add(n.get("value"))
+                walk(n["children"])
+
+    walk(tree_nodes)
+    return sorted(v for v in expanded if v is not None)
+
+
+# -------------------------------------------------
+# Lazy rendering (collapsed branches as placeholders)
+# -------------------------------------------------
+
+# value of the single stand-in child of a collapsed branch
+LAZY_PREFIX = "LAZY:"
+
+
+class TreeIndex:
+    """
+    Branch/leaf relations of a node list: every branch's leaf values
+    (all depths below it) and every leaf's ancestors (root first).
+    """
+
+    def __init__(self, nodes):
+        self.leaves: dict = {}
+        self.ancestors: dict = {}
+
+        def walk(node, path):
+            children = node.get("children")
+            if not children:
+                self.ancestors[node["value"]] = path
+                return [node["value"]]
+            below = []
+            for child in children:
+                below.extend(walk(child, path + (node["value"],)))
+            self.leaves[node["value"]] = below
+            return below
+
+        for n in nodes:
+            walk(n, ())
+
+    def lazy_branch(self, leaf_value, lazy) -> str | None:
+        """
+        The outermost branch in `lazy` that contains the leaf.
+        """
+        for branch in self.ancestors.get(leaf_value, ()):
+            if branch in lazy:
+                return branch
+        return None
+
+
+def lazy_nodes(nodes, expanded, checked, index: TreeIndex):
+    """
+    Copy of `nodes` for tree_select in which only branches listed in
+    `expanded` carry their children. A collapsed branch gets its leaf
+    count (and selected count) in the label and one placeholder child,
+    LAZY:<value>, which is checked when every leaf below is, so the
+    branch checkbox keeps showing the right state.
+
+    Returns (nodes, checked values to pass to the widget, lazy) where
+    lazy maps each collapsed branch to whether it was fully checked;
+    feed that to resolve_lazy_checked() with the widget's answer.
+    """
+    expanded = set(expanded or ())
+    selected: dict = {}
+    for leaf in checked or ():
+        for branch in index.ancestors.get(leaf, ()):
+            selected[branch] = selected.get(branch, 0) + 1
+
+    lazy = {}
+
+    def shrink(node):
+        children = node.get("children")
+        if not children:
+            return node
+
+        value = node["value"]
+        if value in expanded:
+            return {**node, "children": [shrink(c) for c in children]}
+
+        total = len(index.leaves[value])
+        n = selected.get(value, 0)
+        lazy[value] = n == total
+        label = node["label"]
+        return {
+            "label": f"{label} ({n:,} of {total:,} selected)" if 0 < n < total else f"{label} ({total:,})",
+            "value": value,
+            "children": [{"label": "Loading…", "value": LAZY_PREFIX + value, "showCheckbox": False}],
+        }
+
+    shown = [shrink(n) for n in nodes]
+    widget_checked = [v for v in checked or () if index.lazy_branch(v, lazy) is None]
+    widget_checked.extend(LAZY_PREFIX + b for b, full in lazy.items() if full)
+    return shown, widget_checked, lazy
+
+
+def resolve_lazy_checked(returned, lazy, previous, index: TreeIndex) -> list[str]:
+    """
+    Full checked list after the widget answered for nodes from
+    lazy_nodes(): leaves of loaded branches as returned; a collapsed
+    branch whose placeholder came back checked is selected entirely, one
+    whose placeholder was checked but came back unchecked is cleared,
+    and any other collapsed branch keeps its `previous` leaves.
+    """
+    returned = list(returned or ())
+    returned_set = set(returned)
+    out = [v for v in returned if not v.startswith(LAZY_PREFIX)]
+
+    for branch in lazy:
+        if LAZY_PREFIX + branch in returned_set:
+            out.extend(index.leaves[branch])
+
+    for v in previous or ():
+        branch = index.lazy_branch(v, lazy)
+        if branch is not None and not lazy[branch] and LAZY_PREFIX + branch not in returned_set:
+            out.append(v)
+
+    return out
+
+
+# -------------------------------------------------
+# Search (subtree of the matches)
+# -------------------------------------------------
+
+def prune_nodes(nodes, keep, index: TreeIndex):
+    """
+    Copy of `nodes` with only the leaves whose value is in `keep` and
+    the branches above them. Returns (nodes, values of the kept
+    branches, i.e. what to expand to show every match, kept leaf values).
+    Branches without matches are skipped without walking them.
+    """
+    keep = set(keep)
+    branches = set()
+    for leaf in keep:
+        branches.update(index.ancestors.get(leaf, ()))
+
+    expanded = []
+    shown = []
+
+    def prune(node):
+        children = node.get("children")
+        if not children:
+            if node["value"] in keep:
+                shown.append(node["value"])
+                return node
+            return None
+        if node["value"] not in branches:
+            return None
+        expanded.append(node["value"])
+        return {**node, "children": [c for c in map(prune, children) if c is not None]}
+
+    pruned = [n for n in map(prune, nodes) if n is not None]
+    return pruned, expanded, shown
 
 
 def compute_row_key_from_df_row(row: dict, dedup_cols: list[str]) -> str: